@@ -0,0 +1,69 @@
+from typing import NamedTuple, Optional
+
+
+class AccountRecord(NamedTuple):
+    """Аккаунт в памяти процесса"""
+    id: int
+    phone: str
+    session_string: str
+    status: str
+    created_at: str
+    last_used_at: Optional[str] = None
+    last_error: Optional[str] = None
+    last_checked_at: Optional[str] = None
+    error_count: int = 0
+
+
+class AccountIndex:
+    """Индекс аккаунтов в памяти: phone -> AccountRecord.
+
+    Загружается из базы один раз и обновляется при каждой записи
+    (write-through), поэтому поиск по телефону - O(1), а список
+    активных аккаунтов хранится готовым до следующего изменения.
+    """
+
+    def __init__(self):
+        self._records = {}  # {phone: AccountRecord}
+        self._active = None  # готовый кортеж активных телефонов
+        self.loaded = False
+        # Ответы из памяти и обращения к базе (считает Storage)
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        return len(self._records)
+
+    def load(self, rows):
+        """Заполнить индекс строками в порядке полей AccountRecord"""
+        self._records = {row[1]: AccountRecord(*row) for row in rows}
+        self._active = None
+        self.loaded = True
+
+    def get(self, phone):
+        return self._records.get(phone)
+
+    def put(self, record):
+        self._records[record.phone] = record
+        self._active = None
+
+    def update(self, phone, **fields):
+        """Изменить поля записи (статус, время проверки и т.п.)"""
+        record = self._records.get(phone)
+        if record is None:
+            return
+        self._records[phone] = record._replace(**fields)
+        if 'status' in fields and fields['status'] != record.status:
+            self._active = None
+
+    def active_phones(self):
+        """Телефоны активных аккаунтов в порядке добавления"""
+        if self._active is None:
+            records = sorted(self._records.values(), key=lambda r: r.id)
+            self._active = tuple(r.phone for r in records if r.status == 'active')
+        return self._active
+
+    def recently_used(self, limit):
+        """Активные аккаунты, которыми пользовались последними"""
+        records = [r for r in self._records.values() if r.status == 'active' and r.last_used_at]
+        records.sort(key=lambda r: r.last_used_at, reverse=True)
+        return [r.phone for r in records[:limit]]
@@ -0,0 +1,238 @@
+import asyncio
+import time
+from collections import OrderedDict
+from contextlib import asynccontextmanager, suppress
+
+from pyrogram.errors import Unauthorized
+
+
+class _PoolEntry:
+    """Запись пула: клиент аккаунта и его счетчики"""
+
+    __slots__ = ('client', 'in_use', 'last_used', 'broken', 'stale', 'lock')
+
+    def __init__(self, client):
+        self.client = client
+        self.in_use = 0
+        self.last_used = time.monotonic()
+        self.broken = False
+        self.stale = False  # сессия сменилась или отозвана - нужен новый клиент
+        self.lock = asyncio.Lock()
+
+
+class AccountPool:
+    """Пул подключенных клиентов аккаунтов.
+
+    Клиенты остаются подключенными между командами и выдаются через
+    ``async with pool.acquire(phone) as client``. Простаивающие клиенты
+    вытесняются по LRU при превышении ``max_size`` и по ``idle_ttl``.
+
+    ``on_connect(phone, client)`` вызывается после каждого подключения
+    (в том числе нового клиента, заменившего клиент со старой сессией),
+    ``on_disconnect(phone, client)`` - перед отключением.
+    """
+
+    def __init__(self, factory, max_size=20, idle_ttl=300, sweep_interval=60,
+                 on_connect=None, on_disconnect=None):
+        self._factory = factory  # async phone -> Client или None
+        self._on_connect = on_connect
+        self._on_disconnect = on_disconnect
+        self._entries = OrderedDict()  # {phone: _PoolEntry}, последний - самый свежий
+        self._lock = asyncio.Lock()
+        self._sweeper = None
+        self.max_size = max_size
+        self.idle_ttl = idle_ttl
+        self.sweep_interval = sweep_interval
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, phone):
+        return phone in self._entries
+
+    @asynccontextmanager
+    async def acquire(self, phone):
+        """Выдать подключенный клиент аккаунта (None, если сессии нет)"""
+        entry = await self._checkout(phone)
+        if entry is None:
+            yield None
+            return
+
+        try:
+            yield entry.client
+        except (ConnectionError, OSError):
+            # Соединение оборвалось - при следующей выдаче переподключимся
+            entry.broken = True
+            raise
+        except Unauthorized:
+            # 401: клиент со старой сессией больше не выдаем
+            entry.stale = True
+            raise
+        finally:
+            await self._release(phone, entry)
+
+    async def pin(self, phone):
+        """Закрепить клиент в пуле: он не вытесняется до unpin()"""
+        entry = await self._checkout(phone)
+        return entry.client if entry else None
+
+    async def unpin(self, phone):
+        """Снять закрепление, сделанное pin()"""
+        entry = self._entries.get(phone)
+        if entry is not None and entry.in_use > 0:
+            await self._release(phone, entry)
+
+    async def warm(self, phone):
+        """Подключить клиент заранее и оставить его в пуле.
+
+        Одновременный acquire() того же аккаунта дождется этого подключения,
+        а не начнет свое. False, если сессии нет.
+        """
+        entry = await self._checkout(phone)
+        if entry is None:
+            return False
+        await self._release(phone, entry)
+        return True
+
+    async def evict(self, phone):
+        """Убрать клиент аккаунта из пула (после отзыва или смены сессии).
+
+        Используемый сейчас клиент отключится при возврате в пул, а
+        закрепленный будет заменен новым при следующей выдаче.
+        """
+        entry = self._entries.get(phone)
+        if entry is None:
+            return
+        entry.stale = True
+        if entry.in_use == 0:
+            await self._discard(phone, entry)
+
+    async def _checkout(self, phone):
+        """Взять запись из пула, создав и подключив клиент при необходимости"""
+        self._ensure_sweeper()
+
+        async with self._lock:
+            entry = self._entries.get(phone)
+            if entry is None:
+                client = await self._factory(phone)
+                if client is None:
+                    return None
+                entry = _PoolEntry(client)
+                self._entries[phone] = entry
+            self._entries.move_to_end(phone)
+            entry.in_use += 1
+
+        try:
+            await self._ensure_connected(phone, entry)
+        except BaseException:
+            entry.in_use -= 1
+            await self._discard(phone, entry)
+            raise
+
+        await self._evict_overflow()
+        return entry
+
+    async def _ensure_connected(self, phone, entry):
+        """Подключить клиент, переподключив его после обрыва"""
+        async with entry.lock:
+            if entry.stale:
+                await self._replace_client(phone, entry)
+            if entry.broken and entry.client.is_connected:
+                with suppress(Exception):
+                    # Инициализированный клиент (/listen) сначала останавливаем
+                    if entry.client.is_initialized:
+                        await entry.client.terminate()
+                    await entry.client.disconnect()
+            if not entry.client.is_connected:
+                await entry.client.connect()
+                if self._on_connect is not None:
+                    await self._on_connect(phone, entry.client)
+            entry.broken = False
+
+    async def _replace_client(self, phone, entry):
+        """Заменить клиент записи новым из factory (закрепление сохраняется)"""
+        client = await self._factory(phone)
+        if client is None:
+            raise ConnectionError(f"сессия аккаунта {phone} не найдена")
+        old, entry.client = entry.client, client
+        entry.stale = entry.broken = False
+        with suppress(Exception):
+            if old.is_initialized:
+                await old.terminate()
+            if old.is_connected:
+                await old.disconnect()
+
+    async def _release(self, phone, entry):
+        """Вернуть запись в пул после использования"""
+        entry.in_use -= 1
+        entry.last_used = time.monotonic()
+        if (entry.broken or entry.stale) and entry.in_use == 0:
+            await self._discard(phone, entry)
+
+    async def _discard(self, phone, entry):
+        """Убрать запись из пула и отключить клиент"""
+        async with self._lock:
+            if self._entries.get(phone) is entry and entry.in_use == 0:
+                del self._entries[phone]
+            else:
+                return
+        await self._disconnect(phone, entry)
+
+    async def _disconnect(self, phone, entry):
+        if self._on_disconnect is not None and entry.client.is_connected:
+            with suppress(Exception):
+                await self._on_disconnect(phone, entry.client)
+        with suppress(Exception):
+            # Инициализированный клиент (с обработчиком обновлений) нельзя просто отключить
+            if entry.client.is_initialized:
+                await entry.client.terminate()
+            if entry.client.is_connected:
+                await entry.client.disconnect()
+
+    async def _evict_overflow(self):
+        """Вытеснить самые старые простаивающие клиенты сверх max_size"""
+        evicted = []
+        async with self._lock:
+            for phone in list(self._entries):
+                if len(self._entries) <= self.max_size:
+                    break
+                entry = self._entries[phone]
+                if entry.in_use == 0:
+                    evicted.append((phone, self._entries.pop(phone)))
+        for phone, entry in evicted:
+            await self._disconnect(phone, entry)
+
+    async def evict_idle(self):
+        """Отключить клиенты, простаивающие дольше idle_ttl"""
+        deadline = time.monotonic() - self.idle_ttl
+        evicted = []
+        async with self._lock:
+            for phone, entry in list(self._entries.items()):
+                if entry.in_use == 0 and entry.last_used < deadline:
+                    evicted.append((phone, self._entries.pop(phone)))
+        for phone, entry in evicted:
+            await self._disconnect(phone, entry)
+        return len(evicted)
+
+    def _ensure_sweeper(self):
+        if self._sweeper is None or self._sweeper.done():
+            self._sweeper = asyncio.get_running_loop().create_task(self._sweep_loop())
+
+    async def _sweep_loop(self):
+        while True:
+            await asyncio.sleep(self.sweep_interval)
+            await self.evict_idle()
+
+    async def close(self):
+        """Остановить чистильщик и отключить все клиенты"""
+        if self._sweeper is not None:
+            self._sweeper.cancel()
+            with suppress(asyncio.CancelledError):
+                await self._sweeper
+            self._sweeper = None
+
+        async with self._lock:
+            entries = list(self._entries.items())
+            self._entries.clear()
+        for phone, entry in entries:
+            await self._disconnect(phone, entry)
@@ -0,0 +1,127 @@
+"""Сравнение CodeExtractor с прежним циклом поиска кода.
+
+Запуск: python -m benchmarks.bench_code_extractor [повторов]
+"""
+import re
+import sys
+import time
+
+from code_extractor import CodeExtractor
+from benchmarks.code_corpus import CHATTER, CORPUS
+
+
+def legacy_extract(text):
+    """Прежний поиск кода из process_get_code для одного сообщения"""
+    code_patterns = [
+        r'\b\d{4,6}\b',
+        r'код[:\s]*(\d{4,6})',
+        r'code[:\s]*(\d{4,6})',
+        r'(\d{4,6})\s+[-\w]+',
+    ]
+    text_lower = text.lower()
+    found_code = None
+    for pattern in code_patterns:
+        match = re.search(pattern, text, re.IGNORECASE)
+        if match:
+            found_code = match.group(1) if match.groups() else match.group(0)
+            break
+    if found_code and re.match(r'^\d{4,6}$', found_code):
+        if 'код' in text_lower or 'code' in text_lower or 'пароль' in text_lower:
+            return found_code
+        return None
+    return found_code
+
+
+def legacy_find(texts):
+    """Прежний цикл: первое сообщение истории, в котором нашелся код"""
+    for text in texts:
+        code = legacy_extract(text)
+        if code:
+            return code
+    return None
+
+
+def build_histories(window=20):
+    """Истории чатов как в process_get_code: переписка и одно сервисное сообщение"""
+    histories = []
+    for i, (text, _) in enumerate(CORPUS):
+        history = [CHATTER[(i + j) % len(CHATTER)] for j in range(window - 1)]
+        history.insert(i % window, text)
+        histories.append(history)
+    return histories
+
+
+def accuracy(extract):
+    hits = sum(1 for text, expected in CORPUS if extract(text) == expected)
+    return hits / len(CORPUS)
+
+
+def best_rate(run, items, rounds=5):
+    """Лучшая скорость (элементов/с) из нескольких прогонов: меньше шума от соседей по машине"""
+    best = None
+    for _ in range(rounds):
+        started = time.perf_counter()
+        run()
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+    return items / best
+
+
+def throughput(extract, repeat):
+    texts = [text for text, _ in CORPUS]
+
+    def run():
+        for _ in range(repeat):
+            for text in texts:
+                extract(text)
+    return best_rate(run, len(texts) * repeat)
+
+
+def main():
+    repeat = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    extractor = CodeExtractor()
+
+    def new_extract(text):
+        match = extractor.extract(text)
+        return match.code if match else None
+
+    def new_find(texts):
+        match = extractor.find(texts)
+        return match.code if match else None
+
+    print(f"Корпус: {len(CORPUS)} сервисных сообщений, повторов: {repeat}")
+    message_rates = {}
+    for name, extract in (("legacy", legacy_extract), ("extractor", new_extract)):
+        message_rates[name] = throughput(extract, repeat)
+        print(
+            f"{name:>10}: точность {accuracy(extract):6.1%}, "
+            f"{message_rates[name]:12,.0f} сообщений/с"
+        )
+
+    histories = build_histories()
+    history_repeat = max(repeat // 20, 1)
+    print(f"Истории чатов: {len(histories)} по {len(histories[0])} сообщений, повторов: {history_repeat}")
+    history_rates = {}
+    for name, find in (("legacy", legacy_find), ("extractor", new_find)):
+        def run():
+            for _ in range(history_repeat):
+                for history in histories:
+                    find(history)
+        history_rates[name] = best_rate(run, len(histories) * history_repeat)
+        print(f"{name:>10}: {history_rates[name]:12,.0f} историй/с")
+
+    # Прежний цикл останавливается на первом совпадении шаблона, а экстрактор
+    # оценивает всех кандидатов - на сообщении с кодом он может быть медленнее
+    print(
+        f"extractor/legacy: сообщение с кодом x{message_rates['extractor'] / message_rates['legacy']:.2f}, "
+        f"история чата x{history_rates['extractor'] / history_rates['legacy']:.2f}"
+    )
+
+    for text, expected in CORPUS:
+        got = new_extract(text)
+        if got != expected:
+            print(f"  промах: ожидали {expected!r}, получили {got!r}: {text[:60]!r}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,54 @@
+# Образцы сервисных сообщений: (текст, ожидаемый код или None)
+CORPUS = [
+    ("Код подтверждения: 48213. Никому не давайте код, даже если его требуют от имени Telegram!", "48213"),
+    ("Login code: 57109. Do not give this code to anyone, even if they say they are from Telegram!", "57109"),
+    ("Ваш код для входа в Telegram: 90311\n\nЭтот код используется для входа в ваш аккаунт.", "90311"),
+    ("Your verification code is 738291", "738291"),
+    ("Your verification code is 738-291", "738291"),
+    ("Код 1234 действует 5 минут. Заказ 987654 передан в доставку", "1234"),
+    ("Ваш заказ от 2024 года готов. Код получения: 5521", "5521"),
+    ("Пароль для входа в личный кабинет: 660471", "660471"),
+    ("660471 - ваш код для входа в приложение", "660471"),
+    ("Use 402918 as your one-time password (OTP) for login", "402918"),
+    ("Your PIN is 8841. It expires in 10 minutes.", "8841"),
+    ("Никому не сообщайте код! Код: 31337", "31337"),
+    ("Сбербанк: код 772104 для подтверждения перевода 5000 р на карту *1234", "772104"),
+    ("G-582031 is your Google verification code.", "582031"),
+    ("Your WhatsApp code: 201-774. Don't share this code with others", "201774"),
+    ("Встреча завтра в 1830 у главного входа", None),
+    ("Заказ №12345 доставлен в пункт выдачи", None),
+    ("Привет! Как дела? Скинь фото с прошлой недели", None),
+    ("Счет 4400 руб. оплачен, спасибо за покупку", None),
+    ("Перезвоните по номеру +7 912 345 67 89", None),
+    ("Новый вход в аккаунт с устройства iPhone 15, Москва", None),
+    ("Code of conduct was updated on 2023-10-01", None),
+    ("Ваш код: 48213", "48213"),
+    ("code=11520", "11520"),
+    ("Код подтверждения Госуслуг — 402231. Никому его не сообщайте.", "402231"),
+    ("Введите код 9142 в приложении, чтобы завершить регистрацию", "9142"),
+    ("Confirmation code\n\n123456\n\nIf you didn't request this, ignore the message.", "123456"),
+    ("Промокод на скидку 15% действует до 31.12", None),
+    ("Your Telegram code is 84412. You can also tap on this link to log in: t.me/login/84412", "84412"),
+    ("Ozon: 5581 — код для входа. Не сообщайте его никому", "5581"),
+    ("Happiness is 1830 meters up", None),
+    ("Shipping update: order 55210", None),
+    ("Your opinion matters! Survey #2024", None),
+    ("Pinned: meeting moved to 1545", None),
+    ("Hotpot night at 1900, bring friends", None),
+]
+
+# Обычная переписка без кодов: основная часть истории любого чата
+CHATTER = [
+    "Привет! Как дела?",
+    "Ок, увидимся вечером",
+    "Скинь, пожалуйста, фото с прошлой недели, очень нужно для отчета",
+    "Новый вход в аккаунт с устройства iPhone, Москва. Если это не вы, завершите сеанс в настройках",
+    "Спасибо!",
+    "Буду через 15 минут, стою в пробке",
+    "Напомни завтра про встречу",
+    "Документы отправил на почту, проверь когда будет время",
+    "Ага, договорились",
+    "Сегодня не получится, давай перенесем на пятницу",
+    "Hi! Are we still on for tomorrow?",
+    "Sure, see you at the office",
+]
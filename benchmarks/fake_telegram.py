@@ -0,0 +1,262 @@
+"""Локальная замена pyrogram.Client для нагрузочных тестов без Telegram."""
+import asyncio
+import random
+import sqlite3
+import time
+from datetime import datetime
+
+from pyrogram.enums import ChatType
+from pyrogram.errors import FloodWait
+
+from benchmarks.code_corpus import CHATTER
+
+SERVICE_CHAT_ID = 777000
+
+
+class FakeLatency:
+    """Задержки имитируемых вызовов (секунды) и вероятность FloodWait"""
+
+    def __init__(self, scale=1.0, jitter=0.2, flood_rate=0.0, flood_wait=1):
+        self.scale = scale
+        self.jitter = jitter
+        self.flood_rate = flood_rate
+        self.flood_wait = flood_wait  # сколько секунд "просит" сервер
+        self.calls = {
+            'connect': 0.05,
+            'disconnect': 0.005,
+            'get_me': 0.02,
+            'get_dialogs': 0.03,
+            'get_chat_history': 0.02,
+            'create_channel': 0.1,
+            'create_chat_invite_link': 0.03,
+            'send_code': 0.05,
+            'sign_in': 0.05,
+            'check_password': 0.05,
+            'reply': 0.005,  # ответ бота через Bot API
+        }
+        self.floods = 0
+
+    async def wait(self, call, can_flood=True):
+        if can_flood and self.flood_rate and random.random() < self.flood_rate:
+            self.floods += 1
+            raise FloodWait(value=self.flood_wait)
+        base = self.calls[call] * self.scale
+        if base:
+            await asyncio.sleep(base * random.uniform(1 - self.jitter, 1 + self.jitter))
+
+
+class FakeChat:
+    def __init__(self, chat_id, title):
+        self.id = chat_id
+        self.type = ChatType.PRIVATE
+        self.first_name = title
+        self.last_name = None
+        self.title = title
+        self.username = None
+        self.is_verified = chat_id == SERVICE_CHAT_ID
+        self.is_support = False
+
+
+class FakeMessage:
+    def __init__(self, message_id, chat, text):
+        self.id = message_id
+        self.chat = chat
+        self.text = text
+        self.caption = None
+        self.date = datetime.now()
+
+
+class FakeDialog:
+    def __init__(self, chat, messages, unread):
+        self.chat = chat
+        self.top_message = messages[0] if messages else None
+        self.unread_messages_count = unread
+
+
+def build_dialogs(seed, dialogs=10, history=20):
+    """Диалоги аккаунта и их истории (от новых сообщений к старым).
+
+    Служебный чат с кодом специально стоит не на первом месте.
+    """
+    rnd = random.Random(seed)
+    result = []
+    histories = {}
+    service_index = rnd.randrange(1, dialogs)
+    for i in range(dialogs):
+        if i == service_index:
+            chat = FakeChat(SERVICE_CHAT_ID, "Telegram")
+            code = rnd.randrange(10000, 99999)
+            texts = [f"Login code: {code}. Do not give this code to anyone."] + [
+                rnd.choice(CHATTER) for _ in range(history - 1)
+            ]
+            unread = 1
+        else:
+            chat = FakeChat(1000 + i, f"Контакт {i}")
+            texts = [rnd.choice(CHATTER) for _ in range(history)]
+            unread = 0
+        messages = [FakeMessage(history - j, chat, text) for j, text in enumerate(texts)]
+        histories[chat.id] = messages
+        result.append(FakeDialog(chat, messages, unread))
+    return result, histories
+
+
+class FakeStorage:
+    """Хранилище пиров в памяти, как MemoryStorage pyrogram"""
+
+    def __init__(self):
+        self.conn = sqlite3.connect(":memory:")
+        self.conn.execute(
+            "CREATE TABLE peers (id INTEGER PRIMARY KEY, access_hash INTEGER, type INTEGER NOT NULL,"
+            " username TEXT, phone_number TEXT,"
+            " last_update_on INTEGER NOT NULL DEFAULT (CAST(STRFTIME('%s', 'now') AS INTEGER)))"
+        )
+
+    async def update_peers(self, peers):
+        self.conn.executemany(
+            "REPLACE INTO peers (id, access_hash, type, username, phone_number) VALUES (?, ?, ?, ?, ?)",
+            peers
+        )
+
+    def close(self):
+        self.conn.close()
+
+
+class FakeClient:
+    """Заменитель pyrogram.Client с тем же конструктором и нужными боту методами"""
+
+    latency = FakeLatency()
+    instances = 0
+
+    def __init__(self, name, api_id=None, api_hash=None, session_string=None,
+                 in_memory=None, bot_token=None, **kwargs):
+        FakeClient.instances += 1
+        self.name = name
+        self.session_string = session_string
+        self.is_connected = False
+        self.is_initialized = False
+        self.storage = None
+        self._handlers = []
+        self._dialogs, self._history = build_dialogs(name)
+
+    @classmethod
+    def configure(cls, **latency):
+        """Задержки и FloodWait (аргументы FakeLatency); для воркеров - через client_options"""
+        cls.latency = FakeLatency(**latency)
+
+    async def connect(self):
+        if self.is_connected:
+            raise ConnectionError("Client is already connected")
+        await self.latency.wait('connect', can_flood=False)
+        self.storage = FakeStorage()  # как в pyrogram: пиры не переживают переподключение
+        self.is_connected = True
+        return True
+
+    async def disconnect(self):
+        if self.is_initialized:
+            raise ConnectionError("Can't disconnect an initialized client")
+        await self.latency.wait('disconnect', can_flood=False)
+        self.storage.close()
+        self.is_connected = False
+
+    async def initialize(self):
+        self.is_initialized = True
+
+    async def terminate(self):
+        self.is_initialized = False
+        self._handlers.clear()  # как dispatcher.stop() в pyrogram
+
+    async def invoke(self, query):
+        return None
+
+    def add_handler(self, handler, group=0):
+        self._handlers.append(handler)
+
+    def remove_handler(self, handler, group=0):
+        self._handlers.remove(handler)
+
+    def _check_connected(self):
+        if not self.is_connected:
+            raise ConnectionError("Client has not been started yet")
+
+    async def get_me(self):
+        self._check_connected()
+        await self.latency.wait('get_me')
+        return FakeChat(1, self.name)
+
+    async def get_dialogs(self, limit=0):
+        self._check_connected()
+        await self.latency.wait('get_dialogs')
+        dialogs = self._dialogs[:limit or None]
+        await self.storage.update_peers([(d.chat.id, d.chat.id * 7, 'user', None, None) for d in dialogs])
+        for dialog in dialogs:
+            yield dialog
+
+    async def get_chat_history(self, chat_id, limit=0, offset=0, offset_id=0, offset_date=None):
+        self._check_connected()
+        await self.latency.wait('get_chat_history')
+        messages = self._history.get(chat_id, [])
+        if offset_id:
+            messages = [m for m in messages if m.id < offset_id]
+        for message in messages[:limit or None]:
+            yield message
+
+    async def create_channel(self, title, description=None):
+        self._check_connected()
+        await self.latency.wait('create_channel')
+        channel = FakeChat(-100 - int(time.time() * 1000) % 10 ** 9, title)
+        channel.type = ChatType.CHANNEL
+        return channel
+
+    async def create_chat_invite_link(self, chat_id, **kwargs):
+        self._check_connected()
+        await self.latency.wait('create_chat_invite_link')
+        return type('InviteLink', (), {'invite_link': f"https://t.me/+fake{abs(chat_id)}"})()
+
+    async def send_code(self, phone_number):
+        self._check_connected()
+        await self.latency.wait('send_code')
+        return type('SentCode', (), {'phone_code_hash': f"hash-{phone_number}"})()
+
+    async def sign_in(self, phone_number, phone_code_hash, phone_code):
+        self._check_connected()
+        await self.latency.wait('sign_in')
+        self.session_string = f"fake-session-{phone_number}"
+        return FakeChat(1, phone_number)
+
+    async def check_password(self, password):
+        await self.latency.wait('check_password')
+
+    async def export_session_string(self):
+        return self.session_string
+
+
+class FakeUser:
+    def __init__(self, user_id):
+        self.id = user_id
+
+
+class FakeBotMessage:
+    """Входящее сообщение боту: записывает ответы и имитирует задержку Bot API"""
+
+    latency = FakeLatency()
+    api_calls = 0  # отправки и правки сообщений бота
+
+    def __init__(self, user_id, text):
+        self.from_user = FakeUser(user_id)
+        self.chat = FakeChat(user_id, f"user{user_id}")
+        self.text = text
+        self.command = text[1:].split() if text.startswith('/') else None
+        self.replies = []
+
+    async def reply_text(self, text, **kwargs):
+        FakeBotMessage.api_calls += 1
+        await self.latency.wait('reply', can_flood=False)
+        reply = FakeBotMessage(self.from_user.id, text)
+        self.replies.append(reply)
+        return reply
+
+    async def edit_text(self, text, **kwargs):
+        FakeBotMessage.api_calls += 1
+        await self.latency.wait('reply', can_flood=False)
+        self.text = text
+        return self
@@ -0,0 +1,167 @@
+"""Нагрузочный тест обработчиков бота без Telegram.
+
+pyrogram.Client заменяется на FakeClient, а тысячи пользователей
+одновременно проходят сценарии /get_code, /create_channel и добавления
+аккаунта через handle_states. С --workers N поиск кода и создание
+каналов идут через процессы-воркеры (в них тоже FakeClient). В конце печатаются p50/p95/p99 задержек,
+пропускная способность и пиковая память.
+
+Запуск: python -m benchmarks.load_test --users 2000
+"""
+import argparse
+import asyncio
+import os
+import resource
+import sys
+import tempfile
+import time
+import tracemalloc
+
+from benchmarks.fake_telegram import FakeBotMessage, FakeClient, FakeLatency
+from workers import WorkerPool
+
+SCENARIOS = ('get_code', 'create_channel', 'add_account')
+
+
+def load_bot(db_path):
+    """Импортировать bot.py с подменой Client и временной базой"""
+    os.environ.setdefault("BOT_TOKEN", "0:benchmark")
+    os.environ["DB_PATH"] = db_path
+    import bot
+    bot.Client = FakeClient
+    return bot
+
+
+def percentile(values, q):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, int(round(q * (len(ordered) - 1))))
+    return ordered[index]
+
+
+async def scenario_get_code(bot, user_id, phone):
+    message = FakeBotMessage(user_id, f"/get_code {phone}")
+    await bot.get_code_command(None, message)
+    return message
+
+
+async def scenario_create_channel(bot, user_id, phone):
+    await bot.create_channel_start(None, FakeBotMessage(user_id, f"/create_channel {phone}"))
+    await bot.handle_states(None, FakeBotMessage(user_id, f"Канал {user_id}"))
+    message = FakeBotMessage(user_id, "-")
+    await bot.handle_states(None, message)
+    return message
+
+
+async def scenario_add_account(bot, user_id, phone):
+    await bot.add_account_start(None, FakeBotMessage(user_id, "/add_account"))
+    await bot.handle_states(None, FakeBotMessage(user_id, f"+7955{user_id:07d}"))
+    message = FakeBotMessage(user_id, "12345")
+    await bot.handle_states(None, message)
+    return message
+
+
+async def run(args):
+    db_dir = tempfile.mkdtemp(prefix="bot-load-")
+    bot = load_bot(os.path.join(db_dir, "accounts.db"))
+    client_options = {
+        'scale': args.latency_scale, 'flood_rate': args.flood_rate, 'flood_wait': args.flood_wait,
+    }
+    FakeClient.configure(**client_options)
+    FakeBotMessage.latency = FakeLatency(scale=args.latency_scale)
+    bot.account_pool.max_size = args.pool_size
+    bot.login_sessions.max_pending = max(bot.login_sessions.max_pending, args.users)
+
+    await bot.storage.init_db()
+    phones = [f"+7900{i:07d}" for i in range(args.accounts)]
+    for phone in phones:
+        await bot.storage.save_account_session(phone, f"fake-session-{phone}")
+
+    if args.workers:
+        config = dict(bot.WORKER_CONFIG, pool_size=args.pool_size,
+                      client='benchmarks.fake_telegram:FakeClient', client_options=client_options)
+        bot.account_jobs = WorkerPool(args.workers, config)
+        await bot.account_jobs.start()
+
+    handlers = {
+        'get_code': scenario_get_code,
+        'create_channel': scenario_create_channel,
+        'add_account': scenario_add_account,
+    }
+    scenarios = [s for s in args.scenarios.split(',') if s]
+    latencies = {name: [] for name in scenarios}
+    failures = {name: 0 for name in scenarios}
+
+    async def user(user_id):
+        name = scenarios[user_id % len(scenarios)]
+        phone = phones[user_id % len(phones)]
+        started = time.perf_counter()
+        message = await handlers[name](bot, user_id, phone)
+        latencies[name].append(time.perf_counter() - started)
+        last = message.replies[-1].text if message.replies else ""
+        if not last.startswith("✅"):
+            failures[name] += 1
+
+    # tracemalloc точнее, но сильно замедляет Python - включается флагом
+    if args.tracemalloc:
+        tracemalloc.start()
+    started = time.perf_counter()
+    await asyncio.gather(*(user(user_id) for user_id in range(1, args.users + 1)))
+    elapsed = time.perf_counter() - started
+    if args.tracemalloc:
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        memory = f"пиковая память (tracemalloc): {peak / 1024 / 1024:.1f} МБ"
+    else:
+        peak_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss  # КБ в Linux
+        memory = f"пиковый RSS процесса: {peak_rss / 1024:.1f} МБ"
+
+    print(f"Пользователей: {args.users}, аккаунтов: {args.accounts}, пул: {args.pool_size}, "
+          f"воркеров: {args.workers}, "
+          f"масштаб задержек: {args.latency_scale}, FloodWait: {args.flood_rate:.1%}")
+    print(f"{'сценарий':>15} {'n':>6} {'ошибок':>7} {'p50, мс':>9} {'p95, мс':>9} {'p99, мс':>9}")
+    for name in scenarios:
+        values = latencies[name]
+        print(
+            f"{name:>15} {len(values):>6} {failures[name]:>7} "
+            f"{percentile(values, 0.50) * 1000:>9.1f} "
+            f"{percentile(values, 0.95) * 1000:>9.1f} "
+            f"{percentile(values, 0.99) * 1000:>9.1f}"
+        )
+    print(f"Время: {elapsed:.2f}с, пропускная способность: {args.users / elapsed:,.0f} сценариев/с")
+    floods = FakeClient.latency.floods
+    if args.workers:
+        # FloodWait вызовов в воркерах проходят через их очереди
+        floods += (await bot.account_jobs.worker_stats()).get('flood_waits', 0)
+    print(f"Память: {memory}, клиентов создано: {FakeClient.instances}, "
+          f"FloodWait: {floods}, вызовов Bot API: {FakeBotMessage.api_calls}")
+
+    if args.workers:
+        await bot.account_jobs.close()
+    await bot.login_sessions.close_all()
+    await bot.code_listener.close()
+    await bot.account_pool.close()
+    await bot.storage.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--users", type=int, default=1000, help="одновременных пользователей")
+    parser.add_argument("--accounts", type=int, default=100, help="аккаунтов в базе")
+    parser.add_argument("--pool-size", type=int, default=20, help="размер пула клиентов")
+    parser.add_argument("--scenarios", default=",".join(SCENARIOS), help="сценарии через запятую")
+    parser.add_argument("--latency-scale", type=float, default=1.0, help="множитель задержек Telegram")
+    parser.add_argument("--flood-rate", type=float, default=0.0, help="доля вызовов с FloodWait")
+    parser.add_argument("--flood-wait", type=int, default=1, help="секунд ожидания в FloodWait")
+    parser.add_argument("--workers", type=int, default=0, help="процессов-воркеров аккаунтов")
+    parser.add_argument("--tracemalloc", action="store_true", help="считать память через tracemalloc")
+    args = parser.parse_args(argv)
+    unknown = set(args.scenarios.split(',')) - set(SCENARIOS)
+    if unknown:
+        parser.error(f"неизвестные сценарии: {', '.join(sorted(unknown))}")
+    asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    sys.exit(main())
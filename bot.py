@@ -1,15 +1,36 @@
 import os
 import re
-import sqlite3
+import time
 import asyncio
 from datetime import datetime
 
-from pyrogram import Client, filters
-from pyrogram.types import Message
-from pyrogram.errors import SessionPasswordNeeded, PhoneNumberInvalid, PhoneCodeInvalid, PhoneCodeExpired
-from pyrogram.enums import ChatType
+from pyrogram import Client, filters, idle
+from pyrogram.types import Message, CallbackQuery, InlineKeyboardMarkup, InlineKeyboardButton
+from pyrogram.errors import (
+    SessionPasswordNeeded, PhoneNumberInvalid, PhoneCodeInvalid, PhoneCodeExpired, PasswordHashInvalid,
+    FloodWait
+)
 from dotenv import load_dotenv
 
+import metrics
+from account_pool import AccountPool
+from code_extractor import CodeExtractor
+from code_listener import CodeListener
+from code_search import CodeSearch
+from health_checker import SessionHealthChecker
+from jobs import LocalJobs, get_chat_name
+from login_sessions import LoginSessions
+from peer_cache import PeerCache
+from profiler import ProfilerBusy, SamplingProfiler
+from request_timing import SlowRequestLog
+from scheduler import AccountScheduler
+from single_flight import SingleFlight
+from states import State, LoginState, ChannelDraft, transition
+from status_message import StatusMessage
+from storage import Storage
+from warmup import PoolWarmer
+from workers import WorkerPool
+
 # Загружаем переменные окружения
 load_dotenv()
 
@@ -21,6 +42,72 @@ BOT_TOKEN = os.getenv("BOT_TOKEN")  # Берем токен из перемен
 if not BOT_TOKEN:
     raise ValueError("BOT_TOKEN не найден в переменных окружения!")
 
+DB_PATH = os.getenv("DB_PATH", "accounts.db")
+
+# Пул подключенных клиентов аккаунтов
+ACCOUNT_POOL_SIZE = int(os.getenv("ACCOUNT_POOL_SIZE", "20"))
+ACCOUNT_POOL_IDLE_TTL = int(os.getenv("ACCOUNT_POOL_IDLE_TTL", "300"))  # секунды
+
+# Прогрев при запуске: сколько недавно использованных аккаунтов подключить и сколько одновременно
+PREWARM_ACCOUNTS = int(os.getenv("PREWARM_ACCOUNTS", "10"))
+PREWARM_CONCURRENCY = int(os.getenv("PREWARM_CONCURRENCY", "5"))
+
+# Кэш пиров и диалогов аккаунтов в базе: пиров на аккаунт, всего, и сколько
+# секунд список диалогов можно брать из кэша (0 - всегда загружать)
+PEER_CACHE_PER_ACCOUNT = int(os.getenv("PEER_CACHE_PER_ACCOUNT", "1000"))
+PEER_CACHE_TOTAL = int(os.getenv("PEER_CACHE_TOTAL", "200000"))
+DIALOG_CACHE_TTL = int(os.getenv("DIALOG_CACHE_TTL", "0"))  # секунды
+
+# Буфер кодов отслеживаемых аккаунтов (/listen)
+CODE_BUFFER_SIZE = int(os.getenv("CODE_BUFFER_SIZE", "10"))
+CODE_BUFFER_MAX_AGE = int(os.getenv("CODE_BUFFER_MAX_AGE", "300"))  # секунды
+
+# Поиск кода: сколько диалогов просматривать и сколько историй грузить одновременно
+CODE_SEARCH_DIALOGS = int(os.getenv("CODE_SEARCH_DIALOGS", "10"))
+CODE_SEARCH_CONCURRENCY = int(os.getenv("CODE_SEARCH_CONCURRENCY", "4"))
+CODE_RESULT_TTL = int(os.getenv("CODE_RESULT_TTL", "5"))  # секунды, 0 - не кэшировать
+
+# Очередь вызовов API аккаунтов: вызовов в секунду на аккаунт, всплеск,
+# одновременных вызовов всего и самый долгий FloodWait, который пережидаем
+ACCOUNT_RATE = float(os.getenv("ACCOUNT_RATE", "3"))
+ACCOUNT_BURST = int(os.getenv("ACCOUNT_BURST", "15"))
+ACCOUNT_MAX_CONCURRENCY = int(os.getenv("ACCOUNT_MAX_CONCURRENCY", "16"))
+MAX_FLOOD_WAIT = int(os.getenv("MAX_FLOOD_WAIT", "60"))  # секунды
+
+# Фоновая проверка сессий: период (0 - выключить), аккаунтов за проход, одновременных проверок
+HEALTH_CHECK_INTERVAL = int(os.getenv("HEALTH_CHECK_INTERVAL", "600"))  # секунды
+HEALTH_CHECK_BATCH = int(os.getenv("HEALTH_CHECK_BATCH", "50"))
+HEALTH_CHECK_CONCURRENCY = int(os.getenv("HEALTH_CHECK_CONCURRENCY", "5"))
+
+# Процессы-воркеры аккаунтов (0 - все клиенты аккаунтов в процессе бота)
+ACCOUNT_WORKERS = int(os.getenv("ACCOUNT_WORKERS", "0"))
+
+# Метрики: порт Prometheus (0 - выключить) и администраторы для /stats
+METRICS_PORT = int(os.getenv("METRICS_PORT", "9108"))
+ADMIN_IDS = [int(x) for x in os.getenv("ADMIN_IDS", "").split(",") if x.strip()]
+
+# Журнал медленных /get_code и создания канала (0 - выключить)
+SLOW_REQUEST_MS = int(os.getenv("SLOW_REQUEST_MS", "3000"))
+SLOW_LOG_PATH = os.getenv("SLOW_LOG_PATH", "slow_requests.log")
+
+# Профилировщик: /profile [секунды] для администраторов или PROFILE_ON_START секунд после запуска
+PROFILE_DIR = os.getenv("PROFILE_DIR", "profiles")
+PROFILE_INTERVAL_MS = int(os.getenv("PROFILE_INTERVAL_MS", "10"))
+PROFILE_MAX_SECONDS = int(os.getenv("PROFILE_MAX_SECONDS", "300"))
+PROFILE_ON_START = int(os.getenv("PROFILE_ON_START", "0"))  # секунды, 0 - выключить
+
+# Сообщение о ходе операции: показывается, если операция дольше STATUS_SHOW_AFTER,
+# и меняется не чаще раза в STATUS_EDIT_INTERVAL секунд
+STATUS_SHOW_AFTER = float(os.getenv("STATUS_SHOW_AFTER", "0.5"))
+STATUS_EDIT_INTERVAL = float(os.getenv("STATUS_EDIT_INTERVAL", "1.5"))
+
+# Аккаунтов на одной странице списка
+ACCOUNTS_PAGE_SIZE = int(os.getenv("ACCOUNTS_PAGE_SIZE", "10"))
+
+# Незавершенные добавления аккаунтов
+LOGIN_MAX_PENDING = int(os.getenv("LOGIN_MAX_PENDING", "50"))
+LOGIN_SESSION_TTL = int(os.getenv("LOGIN_SESSION_TTL", "600"))  # секунды
+
 # Инициализация бота
 app = Client(
     "account_manager_bot",
@@ -29,67 +116,154 @@ app = Client(
     bot_token=BOT_TOKEN
 )
 
-# База данных
-def init_db():
-    """Инициализация базы данных"""
-    conn = sqlite3.connect('accounts.db')
-    c = conn.cursor()
-    c.execute('''CREATE TABLE IF NOT EXISTS accounts
-                 (id INTEGER PRIMARY KEY AUTOINCREMENT,
-                  phone TEXT UNIQUE,
-                  session_string TEXT,
-                  status TEXT DEFAULT 'active',
-                  created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP)''')
-    conn.commit()
-    conn.close()
+# База данных: одно соединение, запросы выполняются вне цикла событий
+storage = Storage(DB_PATH)
+
+# Поиск кодов в сообщениях (шаблоны компилируются один раз)
+code_extractor = CodeExtractor()
+
+# Поиск кода сразу в нескольких верхних диалогах
+code_search = CodeSearch(
+    code_extractor,
+    dialogs_limit=CODE_SEARCH_DIALOGS,
+    concurrency=CODE_SEARCH_CONCURRENCY
+)
+
+# Все вызовы API аккаунтов идут через общую очередь с ограничением частоты
+scheduler = AccountScheduler(
+    rate=ACCOUNT_RATE,
+    burst=ACCOUNT_BURST,
+    max_concurrency=ACCOUNT_MAX_CONCURRENCY,
+    max_flood_wait=MAX_FLOOD_WAIT
+)
 
 # Состояния пользователей
-user_states = {}  # {user_id: {'state': 'waiting_phone', 'temp_client': Client}}
+user_states = {}  # {user_id: LoginState | ChannelDraft}
 pending_codes = {}  # {phone: {'code': '12345', 'client': Client}}
 
-# Временные клиенты для авторизации
-temp_clients = {}
+# Временные клиенты для авторизации: не больше LOGIN_MAX_PENDING, брошенные удаляются
+login_sessions = LoginSessions(
+    user_states,
+    max_pending=LOGIN_MAX_PENDING,
+    ttl=LOGIN_SESSION_TTL
+)
+
+# Разбивка времени медленных запросов по этапам и профилировщик по команде
+slow_log = SlowRequestLog(SLOW_LOG_PATH, threshold=SLOW_REQUEST_MS / 1000)
+profiler = SamplingProfiler(interval=PROFILE_INTERVAL_MS / 1000, directory=PROFILE_DIR)
 
-def get_account_client(phone):
+metrics.gauge('bot_account_pool_clients', 'Клиенты аккаунтов в пуле', lambda: len(account_pool))
+metrics.gauge('bot_listening_accounts', 'Отслеживаемые аккаунты (/listen)', lambda: len(code_listener.listening()))
+metrics.gauge('bot_login_sessions_pending', 'Незавершенные добавления аккаунтов', lambda: len(login_sessions))
+metrics.gauge('bot_login_sessions_connected', 'Подключенные временные клиенты входа', lambda: login_sessions.connected)
+metrics.gauge('bot_login_sessions_expired', 'Добавления аккаунтов, брошенные и удаленные по времени', lambda: login_sessions.expired)
+metrics.gauge('bot_login_sessions_rejected', 'Добавления аккаунтов, отклоненные из-за лимита', lambda: login_sessions.rejected)
+metrics.gauge('bot_account_index_hits', 'Ответы индекса аккаунтов из памяти', lambda: storage.index.hits)
+metrics.gauge('bot_account_index_misses', 'Обращения к базе за аккаунтами', lambda: storage.index.misses)
+metrics.gauge('bot_scheduler_waiting', 'Вызовы API аккаунтов в очереди', lambda: scheduler.waiting)
+metrics.gauge('bot_scheduler_running', 'Выполняющиеся вызовы API аккаунтов', lambda: scheduler.running)
+metrics.gauge('bot_scheduler_flood_waits', 'Полученные FloodWait', lambda: scheduler.flood_waits)
+metrics.gauge('bot_code_lookups_coalesced', 'Запросы кода, объединенные с уже идущими', lambda: code_lookups.coalesced)
+metrics.gauge('bot_code_lookups_cache_hits', 'Запросы кода, отвеченные из кэша', lambda: code_lookups.cache_hits)
+metrics.gauge('bot_code_search_failed_dialogs', 'Диалоги, историю которых не удалось загрузить', lambda: code_search.failed_dialogs)
+metrics.gauge('bot_health_checked', 'Проверено сессий', lambda: health_checker.checked)
+metrics.gauge('bot_health_revoked', 'Найдено отозванных сессий', lambda: health_checker.revoked)
+metrics.gauge('bot_slow_requests', 'Запросы, записанные в журнал медленных', lambda: slow_log.recorded)
+
+async def get_account_client(phone):
     """Получить клиент для существующего аккаунта из базы"""
-    conn = sqlite3.connect('accounts.db')
-    c = conn.cursor()
-    c.execute("SELECT session_string FROM accounts WHERE phone = ?", (phone,))
-    result = c.fetchone()
-    conn.close()
-    
-    if result:
-        session_string = result[0]
-        return Client(
+    session_string = await storage.get_session(phone)
+    
+    if session_string:
+        # Вызовы MTProto клиента учитываются в метриках и идут через очередь.
+        # sleep_threshold=0: FloodWait пережидает планировщик, а не pyrogram,
+        # чтобы остальные вызовы аккаунта тоже подождали
+        client = metrics.instrument_client(Client(
             f"account_{phone}",
             api_id=API_ID,
             api_hash=API_HASH,
-            session_string=session_string
-        )
+            session_string=session_string,
+            sleep_threshold=0
+        ))
+        return scheduler.wrap(client, phone)
     return None
 
-def save_account_session(phone, session_string):
-    """Сохранить сессию аккаунта в базу"""
-    conn = sqlite3.connect('accounts.db')
-    c = conn.cursor()
-    c.execute(
-        "INSERT OR REPLACE INTO accounts (phone, session_string, status) VALUES (?, ?, ?)",
-        (phone, session_string, 'active')
-    )
-    conn.commit()
-    conn.close()
-
-def get_all_accounts():
-    """Получить все активные аккаунты"""
-    conn = sqlite3.connect('accounts.db')
-    c = conn.cursor()
-    c.execute("SELECT phone FROM accounts WHERE status = 'active'")
-    accounts = [row[0] for row in c.fetchall()]
-    conn.close()
-    return accounts
+# Пиры аккаунтов переживают переподключения: сохраняются при отключении
+peer_cache = PeerCache(
+    storage,
+    max_per_account=PEER_CACHE_PER_ACCOUNT,
+    max_total=PEER_CACHE_TOTAL,
+    dialogs_ttl=DIALOG_CACHE_TTL
+)
+
+async def on_account_connect(phone, client):
+    """Клиент аккаунта подключен пулом"""
+    await peer_cache.load(phone, client)
+    await code_listener.on_connect(phone, client)
+
+async def on_account_disconnect(phone, client):
+    """Пул отключает клиент аккаунта"""
+    await code_listener.on_disconnect(phone, client)
+    await peer_cache.save(phone, client)
+
+# Клиенты аккаунтов держим подключенными между командами
+account_pool = AccountPool(
+    get_account_client,
+    max_size=ACCOUNT_POOL_SIZE,
+    idle_ttl=ACCOUNT_POOL_IDLE_TTL,
+    on_connect=on_account_connect,
+    on_disconnect=on_account_disconnect
+)
+
+# Поиск кода и создание каналов: в этом процессе или в воркерах по хэшу телефона
+WORKER_CONFIG = {
+    'api_id': API_ID,
+    'api_hash': API_HASH,
+    'db_path': DB_PATH,
+    'pool_size': ACCOUNT_POOL_SIZE,
+    'pool_idle_ttl': ACCOUNT_POOL_IDLE_TTL,
+    'search_dialogs': CODE_SEARCH_DIALOGS,
+    'search_concurrency': CODE_SEARCH_CONCURRENCY,
+    'account_rate': ACCOUNT_RATE,
+    'account_burst': ACCOUNT_BURST,
+    'account_max_concurrency': ACCOUNT_MAX_CONCURRENCY,
+    'max_flood_wait': MAX_FLOOD_WAIT,
+    'peer_cache_per_account': PEER_CACHE_PER_ACCOUNT,
+    'peer_cache_total': PEER_CACHE_TOTAL,
+    'dialog_cache_ttl': DIALOG_CACHE_TTL,
+}
+if ACCOUNT_WORKERS:
+    account_jobs = WorkerPool(ACCOUNT_WORKERS, WORKER_CONFIG)
+else:
+    account_jobs = LocalJobs(account_pool, code_search, storage, peer_cache, factory=get_account_client)
+
+# Одновременные /get_code одного аккаунта ждут один общий поиск
+code_lookups = SingleFlight(ttl=CODE_RESULT_TTL)
+
+# Недавно использованные аккаунты подключаем в фоне сразу после запуска
+pool_warmer = PoolWarmer(account_jobs, concurrency=PREWARM_CONCURRENCY)
+
+# Отозванные сессии находим заранее, а не во время /get_code (проверяет владелец клиентов аккаунта)
+health_checker = SessionHealthChecker(
+    storage,
+    account_jobs,
+    interval=HEALTH_CHECK_INTERVAL,
+    batch_size=HEALTH_CHECK_BATCH,
+    concurrency=HEALTH_CHECK_CONCURRENCY
+)
+
+# Отслеживаемые аккаунты получают коды сразу при поступлении. С воркерами
+# /listen выключен: клиент аккаунта уже подключен в воркере с той же сессией
+code_listener = CodeListener(
+    account_pool,
+    code_extractor,
+    chat_name=get_chat_name,
+    buffer_size=CODE_BUFFER_SIZE
+)
 
 # Команды бота
 @app.on_message(filters.command("start"))
+@metrics.timed("start_command")
 async def start_command(client: Client, message: Message):
     """Обработчик команды /start"""
     await message.reply_text(
@@ -97,12 +271,14 @@ async def start_command(client: Client, message: Message):
         "📱 Доступные команды:\n"
         "/add_account - Добавить новый аккаунт\n"
         "/accounts - Список аккаунтов\n"
-        "/get_code - Получить код из последнего сообщения\n"
+        "/get_code - Найти код в последних сообщениях\n"
         "/create_channel - Создать канал\n"
+        "/listen - Отслеживать коды аккаунта\n"
         "/help - Помощь"
     )
 
 @app.on_message(filters.command("help"))
+@metrics.timed("help_command")
 async def help_command(client: Client, message: Message):
     """Обработчик команды /help"""
     await message.reply_text(
@@ -110,11 +286,16 @@ async def help_command(client: Client, message: Message):
         "**Добавление аккаунта:**\n"
         "1. Нажмите /add_account\n"
         "2. Введите номер телефона в формате +79123456789\n"
-        "3. Введите код подтверждения\n\n"
+        "3. Введите код подтверждения\n"
+        "4. Если включена двухфакторная аутентификация - введите пароль\n\n"
         "**Получение кода:**\n"
         "1. Нажмите /get_code\n"
-        "2. Выберите аккаунт\n"
-        "3. Бот найдет первый чат и покажет код из последнего сообщения\n\n"
+        "2. Выберите аккаунт кнопкой (/get_code +7912 - поиск по началу номера)\n"
+        "3. Бот просмотрит последние чаты и покажет найденный код\n\n"
+        "**Отслеживание кодов:**\n"
+        "/listen +79123456789 - бот ловит коды сразу при поступлении,\n"
+        "и /get_code отвечает мгновенно\n"
+        "/unlisten +79123456789 - прекратить отслеживание\n\n"
         "**Создание канала:**\n"
         "1. Нажмите /create_channel\n"
         "2. Выберите аккаунт\n"
@@ -123,6 +304,7 @@ async def help_command(client: Client, message: Message):
     )
 
 @app.on_message(filters.command("add_account"))
+@metrics.timed("add_account_start")
 async def add_account_start(client: Client, message: Message):
     """Начало добавления аккаунта"""
     user_id = message.from_user.id
@@ -135,153 +317,251 @@ async def add_account_start(client: Client, message: Message):
         in_memory=True
     )
     
-    user_states[user_id] = {
-        'state': 'waiting_phone',
-        'temp_client': temp_client
-    }
+    # Предыдущая незавершенная сессия пользователя закрывается внутри start()
+    if await login_sessions.start(user_id, temp_client) is None:
+        await message.reply_text("⏳ Сейчас добавляется слишком много аккаунтов, попробуйте позже")
+        return
     
     await message.reply_text(
         "📱 Введите номер телефона в международном формате (например, +79123456789):"
     )
 
 @app.on_message(filters.command("accounts"))
+@metrics.timed("list_accounts")
 async def list_accounts(client: Client, message: Message):
-    """Список всех аккаунтов"""
-    accounts = get_all_accounts()
+    """Список аккаунтов (постранично, /accounts +7912 - поиск по началу номера)"""
+    prefix = command_prefix(message)
+    rows, has_next = await storage.get_accounts_page(limit=ACCOUNTS_PAGE_SIZE, prefix=prefix)
     
-    if not accounts:
-        await message.reply_text("📭 Нет добавленных аккаунтов")
+    if not rows:
+        await message.reply_text(f"🔎 Аккаунты на `{prefix}` не найдены" if prefix else "📭 Нет добавленных аккаунтов")
         return
     
-    text = "📱 **Список аккаунтов:**\n\n"
-    for i, phone in enumerate(accounts, 1):
-        text += f"{i}. `{phone}`\n"
-    
-    await message.reply_text(text)
+    text, markup = render_accounts_page('list', rows, prefix, has_prev=False, has_next=has_next)
+    await message.reply_text(text, reply_markup=markup)
 
 @app.on_message(filters.command("get_code"))
+@metrics.timed("get_code_command")
 async def get_code_command(client: Client, message: Message):
-    """Получить код из первого чата"""
-    accounts = get_all_accounts()
+    """Найти код в последних чатах аккаунта"""
+    prefix = command_prefix(message)
+    rows, has_next = await storage.get_accounts_page(limit=ACCOUNTS_PAGE_SIZE, prefix=prefix)
     
-    if not accounts:
-        await message.reply_text("❌ Сначала добавьте аккаунт через /add_account")
+    if not rows:
+        if prefix:
+            await message.reply_text(f"🔎 Аккаунты на `{prefix}` не найдены")
+        else:
+            await message.reply_text("❌ Сначала добавьте аккаунт через /add_account")
         return
     
-    if len(accounts) == 1:
-        # Если только один аккаунт, сразу используем его
-        await process_get_code(message, accounts[0])
+    if len(rows) == 1 and not has_next:
+        # Если подходит только один аккаунт, сразу используем его
+        await process_get_code(message, rows[0][1])
     else:
         # Если несколько, предлагаем выбрать
-        text = "🔍 Выберите аккаунт для поиска кода:\n\n"
-        for i, phone in enumerate(accounts, 1):
-            text += f"{i}. `{phone}`\n"
-        text += "\nОтправьте номер аккаунта (1, 2, ...):"
-        
-        user_states[message.from_user.id] = {
-            'state': 'selecting_account_for_code',
-            'accounts': accounts
-        }
-        await message.reply_text(text)
+        text, markup = render_accounts_page('code', rows, prefix, has_prev=False, has_next=has_next)
+        await message.reply_text(text, reply_markup=markup)
 
 @app.on_message(filters.command("create_channel"))
+@metrics.timed("create_channel_start")
 async def create_channel_start(client: Client, message: Message):
     """Начало создания канала"""
-    accounts = get_all_accounts()
+    prefix = command_prefix(message)
+    rows, has_next = await storage.get_accounts_page(limit=ACCOUNTS_PAGE_SIZE, prefix=prefix)
     
-    if not accounts:
-        await message.reply_text("❌ Сначала добавьте аккаунт через /add_account")
+    if not rows:
+        if prefix:
+            await message.reply_text(f"🔎 Аккаунты на `{prefix}` не найдены")
+        else:
+            await message.reply_text("❌ Сначала добавьте аккаунт через /add_account")
         return
     
-    if len(accounts) == 1:
-        user_states[message.from_user.id] = {
-            'state': 'creating_channel_title',
-            'phone': accounts[0]
-        }
+    if len(rows) == 1 and not has_next:
+        user_states[message.from_user.id] = ChannelDraft(phone=rows[0][1])
         await message.reply_text("📢 Введите название для нового канала:")
     else:
-        text = "📢 Выберите аккаунт для создания канала:\n\n"
-        for i, phone in enumerate(accounts, 1):
-            text += f"{i}. `{phone}`\n"
-        text += "\nОтправьте номер аккаунта (1, 2, ...):"
-        
-        user_states[message.from_user.id] = {
-            'state': 'selecting_account_for_channel',
-            'accounts': accounts
-        }
+        text, markup = render_accounts_page('chan', rows, prefix, has_prev=False, has_next=has_next)
+        await message.reply_text(text, reply_markup=markup)
+
+@app.on_callback_query(filters.regex(r'^pg:'))
+@metrics.timed("accounts_page_callback")
+async def accounts_page_callback(client: Client, callback_query: CallbackQuery):
+    """Листание страниц списка аккаунтов"""
+    _, action, cursor, prefix = callback_query.data.split(':', 3)
+    
+    if cursor.startswith('>'):
+        rows, has_next = await storage.get_accounts_page(
+            after_id=int(cursor[1:]), limit=ACCOUNTS_PAGE_SIZE, prefix=prefix
+        )
+        has_prev = True
+    else:
+        rows, has_prev = await storage.get_accounts_page(
+            before_id=int(cursor[1:]), limit=ACCOUNTS_PAGE_SIZE, prefix=prefix
+        )
+        has_next = True
+    
+    if not rows:
+        await callback_query.answer("Больше аккаунтов нет")
+        return
+    
+    text, markup = render_accounts_page(action, rows, prefix, has_prev=has_prev, has_next=has_next)
+    await callback_query.message.edit_text(text, reply_markup=markup)
+    await callback_query.answer()
+
+@app.on_callback_query(filters.regex(r'^sel:'))
+@metrics.timed("account_selected_callback")
+async def account_selected_callback(client: Client, callback_query: CallbackQuery):
+    """Выбор аккаунта кнопкой"""
+    _, action, phone = callback_query.data.split(':', 2)
+    
+    account = await storage.get_account(phone)
+    if account is None or account.status != 'active':
+        await callback_query.answer("❌ Аккаунт больше недоступен", show_alert=True)
+        return
+    
+    await callback_query.answer()
+    if action == 'code':
+        await process_get_code(callback_query.message, phone)
+    else:
+        user_states[callback_query.from_user.id] = ChannelDraft(phone=phone)
+        await callback_query.message.reply_text("📢 Введите название для нового канала:")
+
+@app.on_message(filters.command("listen"))
+@metrics.timed("listen_command")
+async def listen_command(client: Client, message: Message):
+    """Включить отслеживание кодов аккаунта"""
+    if ACCOUNT_WORKERS:
+        await message.reply_text("ℹ️ /listen недоступен при работе с воркерами аккаунтов (ACCOUNT_WORKERS)")
+        return
+
+    accounts = await storage.get_all_accounts()
+    
+    if len(message.command) > 1:
+        phone = message.command[1]
+    elif len(accounts) == 1:
+        phone = accounts[0]
+    else:
+        listening = code_listener.listening()
+        text = "👂 Использование: /listen +79123456789\n"
+        if listening:
+            text += "\nСейчас отслеживаются:\n" + "\n".join(f"`{phone}`" for phone in listening)
         await message.reply_text(text)
+        return
+    
+    if phone not in accounts:
+        await message.reply_text(f"❌ Аккаунт {phone} не найден")
+        return
+    
+    try:
+        if await code_listener.listen(phone):
+            await message.reply_text(
+                f"👂 Отслеживаю коды аккаунта `{phone}`\n"
+                f"/get_code теперь ответит без запроса истории"
+            )
+        else:
+            await message.reply_text("❌ Не удалось загрузить сессию аккаунта")
+    except Exception as e:
+        metrics.record_error("listen_command", e)
+        await message.reply_text(f"❌ Ошибка при подключении: {str(e)}")
+
+@app.on_message(filters.command("unlisten"))
+@metrics.timed("unlisten_command")
+async def unlisten_command(client: Client, message: Message):
+    """Выключить отслеживание кодов аккаунта"""
+    if len(message.command) < 2:
+        await message.reply_text("Использование: /unlisten +79123456789")
+        return
+    
+    phone = message.command[1]
+    if await code_listener.unlisten(phone):
+        await message.reply_text(f"🔕 Отслеживание `{phone}` выключено")
+    else:
+        await message.reply_text(f"ℹ️ Аккаунт `{phone}` не отслеживается")
+
+@app.on_message(filters.command("stats") & filters.user(ADMIN_IDS))
+@metrics.timed("stats_command")
+async def stats_command(client: Client, message: Message):
+    """Статистика производительности (только для администраторов)"""
+    workers = await account_jobs.worker_stats() if ACCOUNT_WORKERS else {}
+    await message.reply_text(metrics.format_stats({
+        "Клиентов в пуле": len(account_pool),
+        "Отслеживается аккаунтов": len(code_listener.listening()),
+        "Добавлений аккаунтов в процессе": len(login_sessions),
+        "Добавления (начато/завершено/истекло/отклонено)": (
+            f"{login_sessions.started}/{login_sessions.completed}/{login_sessions.expired}/{login_sessions.rejected}"
+        ),
+        "Индекс аккаунтов (память/база)": f"{storage.index.hits}/{storage.index.misses}",
+        "Вызовов API в очереди/выполняется": f"{scheduler.waiting}/{scheduler.running}",
+        "FloodWait (всего/секунд ожидания)": f"{scheduler.flood_waits}/{scheduler.flood_wait_seconds}",
+        "Кэш пиров (загружено/сохранено)": f"{peer_cache.loaded}/{peer_cache.saved}",
+        "Кэш диалогов (попаданий/загрузок)": f"{peer_cache.dialog_hits}/{peer_cache.dialog_misses}",
+        "Поиск кода (всего/объединено/из кэша)": f"{code_lookups.calls}/{code_lookups.coalesced}/{code_lookups.cache_hits}",
+        "Диалоги, не загруженные при поиске кода": code_search.failed_dialogs,
+        "Прогрев пула": (
+            f"{pool_warmer.done}/{pool_warmer.total}, готов за {pool_warmer.duration:.1f}с"
+            if pool_warmer.duration is not None else f"идет, {pool_warmer.done}/{pool_warmer.total}"
+        ),
+        "Воркеры аккаунтов": (
+            "{alive}/{workers} работают, заданий {pending}, перезапусков {restarts}".format(**account_jobs.stats())
+            if ACCOUNT_WORKERS else "выключены"
+        ),
+        **({
+            "Воркеры: клиентов/в очереди/FloodWait": (
+                f"{workers.get('clients', 0)}/{workers.get('waiting', 0)}/{workers.get('flood_waits', 0)}"
+            ),
+            # Гистограммы MTProto и этапы журнала медленных запросов собираются в процессе бота
+            "Метрики MTProto и этапы медленных запросов": "только процесс бота, вызовы в воркерах не учтены",
+        } if ACCOUNT_WORKERS else {}),
+        "Проверено сессий/отозвано/ошибок": f"{health_checker.checked}/{health_checker.revoked}/{health_checker.failed}" + (
+            f", последняя проверка {health_checker.last_sweep_duration:.1f}с"
+            if health_checker.last_sweep_duration is not None else ""
+        ),
+        "Медленных запросов": f"{slow_log.recorded} (дольше {SLOW_REQUEST_MS} мс)" if SLOW_REQUEST_MS else "не пишутся",
+        "Профилировщик": "работает" if profiler.running else "выключен",
+    }))
+
+@app.on_message(filters.command("profile") & filters.user(ADMIN_IDS))
+@metrics.timed("profile_command")
+async def profile_command(client: Client, message: Message):
+    """Профилирование процесса бота на заданное время (только для администраторов)"""
+    args = message.command[1:]
+    seconds = int(args[0]) if args and args[0].isdigit() else 30
+    seconds = max(1, min(seconds, PROFILE_MAX_SECONDS))
+    # Запускаем до первого await: второй /profile увидит, что профилировщик занят
+    try:
+        profiler.start()
+    except ProfilerBusy:
+        await message.reply_text("⏳ Профилирование уже идет, дождитесь результата")
+        return
+
+    try:
+        await message.reply_text(f"🔬 Профилирую {seconds} сек...")
+    except BaseException:
+        await profiler.stop_after(0)
+        raise
+    path = await profiler.stop_after(seconds)
+    await message.reply_document(
+        path,
+        caption=f"🔬 Профиль за {seconds} сек, выборок: {profiler.samples}\n"
+                "Формат folded stacks: flamegraph.pl или speedscope.app"
+    )
 
 # Обработчик текстовых сообщений (для состояний)
 @app.on_message(filters.text & filters.private)
+@metrics.timed("handle_states")
 async def handle_states(client: Client, message: Message):
     """Обработка состояний пользователя"""
-    user_id = message.from_user.id
-    text = message.text
-    
-    # Обработка ввода номера телефона
-    if user_id in user_states and user_states[user_id]['state'] == 'waiting_phone':
-        await process_phone_input(client, message)
-    
-    # Обработка ввода кода подтверждения
-    elif user_id in user_states and user_states[user_id]['state'] == 'waiting_code':
-        await process_code_input(client, message)
-    
-    # Выбор аккаунта для получения кода
-    elif user_id in user_states and user_states[user_id]['state'] == 'selecting_account_for_code':
-        try:
-            idx = int(text) - 1
-            accounts = user_states[user_id]['accounts']
-            if 0 <= idx < len(accounts):
-                phone = accounts[idx]
-                del user_states[user_id]
-                await process_get_code(message, phone)
-            else:
-                await message.reply_text("❌ Неверный номер. Попробуйте снова /get_code")
-        except ValueError:
-            await message.reply_text("❌ Пожалуйста, отправьте число")
-    
-    # Выбор аккаунта для создания канала
-    elif user_id in user_states and user_states[user_id]['state'] == 'selecting_account_for_channel':
-        try:
-            idx = int(text) - 1
-            accounts = user_states[user_id]['accounts']
-            if 0 <= idx < len(accounts):
-                phone = accounts[idx]
-                user_states[user_id] = {
-                    'state': 'creating_channel_title',
-                    'phone': phone
-                }
-                await message.reply_text("📢 Введите название для нового канала:")
-            else:
-                await message.reply_text("❌ Неверный номер. Попробуйте снова /create_channel")
-        except ValueError:
-            await message.reply_text("❌ Пожалуйста, отправьте число")
-    
-    # Ввод названия канала
-    elif user_id in user_states and user_states[user_id]['state'] == 'creating_channel_title':
-        user_states[user_id]['title'] = text
-        user_states[user_id]['state'] = 'creating_channel_description'
-        await message.reply_text(
-            "📝 Введите описание канала (или отправьте '-' чтобы пропустить):"
-        )
+    data = user_states.get(message.from_user.id)
+    if data is None:
+        return
     
-    # Ввод описания канала и создание
-    elif user_id in user_states and user_states[user_id]['state'] == 'creating_channel_description':
-        phone = user_states[user_id]['phone']
-        title = user_states[user_id]['title']
-        description = None if text == '-' else text
-        
-        await message.reply_text("⏳ Создаю канал...")
-        
-        # Создаем канал
-        await create_channel(message, phone, title, description)
-        
-        # Очищаем состояние
-        del user_states[user_id]
+    # Обработчик текущего шага берем из таблицы STATE_HANDLERS
+    await STATE_HANDLERS[data.state](client, message, data)
 
-async def process_phone_input(client: Client, message: Message):
+async def process_phone_input(client: Client, message: Message, data: LoginState):
     """Обработка ввода номера телефона"""
     user_id = message.from_user.id
+    data.touch()
     phone = message.text.strip()
     
     # Простая валидация номера
@@ -289,7 +569,7 @@ async def process_phone_input(client: Client, message: Message):
         await message.reply_text("❌ Неверный формат номера. Используйте формат: +79123456789")
         return
     
-    temp_client = user_states[user_id]['temp_client']
+    temp_client = data.temp_client
     
     try:
         # Отправляем код подтверждения
@@ -297,9 +577,9 @@ async def process_phone_input(client: Client, message: Message):
         sent_code = await temp_client.send_code(phone)
         
         # Сохраняем информацию
-        user_states[user_id]['state'] = 'waiting_code'
-        user_states[user_id]['phone'] = phone
-        user_states[user_id]['phone_code_hash'] = sent_code.phone_code_hash
+        data.phone = phone
+        data.phone_code_hash = sent_code.phone_code_hash
+        transition(data, State.WAITING_CODE)
         
         await message.reply_text(
             "✅ Код подтверждения отправлен!\n"
@@ -308,220 +588,285 @@ async def process_phone_input(client: Client, message: Message):
         
     except PhoneNumberInvalid:
         await message.reply_text("❌ Неверный номер телефона")
-        await temp_client.disconnect()
-        del user_states[user_id]
+        await login_sessions.close(user_id)
     except Exception as e:
         await message.reply_text(f"❌ Ошибка: {str(e)}")
-        await temp_client.disconnect()
-        del user_states[user_id]
+        await login_sessions.close(user_id)
 
-async def process_code_input(client: Client, message: Message):
+async def process_code_input(client: Client, message: Message, data: LoginState):
     """Обработка ввода кода подтверждения"""
     user_id = message.from_user.id
+    data.touch()
     code = message.text.strip()
-    
-    state_data = user_states[user_id]
-    temp_client = state_data['temp_client']
-    phone = state_data['phone']
-    phone_code_hash = state_data['phone_code_hash']
+    temp_client = data.temp_client
     
     try:
         # Пытаемся войти с кодом
         await temp_client.sign_in(
-            phone_number=phone,
-            phone_code_hash=phone_code_hash,
+            phone_number=data.phone,
+            phone_code_hash=data.phone_code_hash,
             phone_code=code
         )
         
-        # Получаем строку сессии
-        session_string = await temp_client.export_session_string()
-        
-        # Сохраняем в базу
-        save_account_session(phone, session_string)
-        
-        await message.reply_text(
-            f"✅ Аккаунт {phone} успешно добавлен!\n"
-            f"Теперь вы можете использовать его для получения кодов и создания каналов."
-        )
-        
-        # Закрываем временное соединение
-        await temp_client.disconnect()
-        del user_states[user_id]
+        await finish_login(message, data)
         
     except SessionPasswordNeeded:
         # Если включена двухфакторка
-        user_states[user_id]['state'] = 'waiting_password'
+        transition(data, State.WAITING_PASSWORD)
         await message.reply_text(
             "🔐 Включена двухфакторная аутентификация.\n"
             "Введите ваш пароль:"
         )
     except PhoneCodeInvalid:
         await message.reply_text("❌ Неверный код. Попробуйте снова /add_account")
-        await temp_client.disconnect()
-        del user_states[user_id]
+        await login_sessions.close(user_id)
     except PhoneCodeExpired:
         await message.reply_text("❌ Код истек. Запросите новый код через /add_account")
-        await temp_client.disconnect()
-        del user_states[user_id]
+        await login_sessions.close(user_id)
     except Exception as e:
         await message.reply_text(f"❌ Ошибка: {str(e)}")
-        await temp_client.disconnect()
-        del user_states[user_id]
+        await login_sessions.close(user_id)
 
-async def process_get_code(message: Message, phone: str):
-    """Поиск кода в первом чате аккаунта"""
-    await message.reply_text(f"🔍 Ищу код в аккаунте {phone}...")
+async def process_password_input(client: Client, message: Message, data: LoginState):
+    """Обработка ввода пароля двухфакторной аутентификации"""
+    user_id = message.from_user.id
+    data.touch()
+    temp_client = data.temp_client
     
     try:
-        # Получаем клиент для аккаунта
-        account_client = get_account_client(phone)
-        if not account_client:
-            await message.reply_text("❌ Не удалось загрузить сессию аккаунта")
-            return
-        
-        await account_client.connect()
-        
-        # Получаем первые 10 диалогов
-        dialogs = []
-        async for dialog in account_client.get_dialogs(limit=10):
-            dialogs.append(dialog)
+        await temp_client.check_password(message.text)
+        await finish_login(message, data)
         
-        if not dialogs:
-            await message.reply_text("❌ Нет диалогов в этом аккаунте")
-            await account_client.disconnect()
+    except PasswordHashInvalid:
+        # Остаемся на этом шаге, чтобы можно было ввести пароль еще раз
+        await message.reply_text("❌ Неверный пароль. Попробуйте еще раз:")
+    except Exception as e:
+        await message.reply_text(f"❌ Ошибка: {str(e)}")
+        await login_sessions.close(user_id)
+
+async def finish_login(message: Message, data: LoginState):
+    """Сохранить сессию авторизованного аккаунта и закрыть временный клиент"""
+    # Получаем строку сессии
+    session_string = await data.temp_client.export_session_string()
+    
+    # Сохраняем в базу
+    await storage.save_account_session(data.phone, session_string)
+    # Аккаунт добавлен заново: клиент и найденный код старой сессии больше не годятся
+    try:
+        await account_jobs.evict(data.phone)
+    except Exception as e:
+        print(f"⚠️ Не удалось убрать старый клиент {data.phone}: {e!r}")
+    code_lookups.forget(('get_code', data.phone))
+    
+    await message.reply_text(
+        f"✅ Аккаунт {data.phone} успешно добавлен!\n"
+        f"Теперь вы можете использовать его для получения кодов и создания каналов."
+    )
+    
+    # Закрываем временное соединение
+    await login_sessions.finish(message.from_user.id)
+
+async def process_channel_title(client: Client, message: Message, data: ChannelDraft):
+    """Ввод названия канала"""
+    data.title = message.text
+    transition(data, State.CREATING_CHANNEL_DESCRIPTION)
+    await message.reply_text(
+        "📝 Введите описание канала (или отправьте '-' чтобы пропустить):"
+    )
+
+async def process_channel_description(client: Client, message: Message, data: ChannelDraft):
+    """Ввод описания канала и создание"""
+    description = None if message.text == '-' else message.text
+    
+    # Очищаем состояние до создания: повторное сообщение не создаст второй канал
+    del user_states[message.from_user.id]
+    
+    # Создаем канал (ход и итог - в одном сообщении)
+    await create_channel(message, data.phone, data.title, description)
+
+@metrics.timed("process_get_code")
+@slow_log.track("get_code")
+async def process_get_code(message: Message, phone: str):
+    """Поиск кода в последних чатах аккаунта"""
+    # Отслеживаемый аккаунт: отвечаем из буфера без запросов к Telegram
+    captured = code_listener.latest(phone, max_age=CODE_BUFFER_MAX_AGE)
+    if captured:
+        await message.reply_text(
+            f"✅ **Найден код!**\n\n"
+            f"📱 **Аккаунт:** `{phone}`\n"
+            f"💬 **Чат:** {captured.chat_name}\n"
+            f"🔑 **Код:** `{captured.code}`\n"
+            f"🕒 **Получен:** {datetime.fromtimestamp(captured.timestamp):%H:%M:%S}\n\n"
+            f"📝 **Сообщение:**\n{captured.excerpt}"
+        )
+        return
+    
+    # Одно сообщение на всю команду: ход поиска и итог пишутся в него же
+    status = StatusMessage(message, min_interval=STATUS_EDIT_INTERVAL, show_after=STATUS_SHOW_AFTER)
+    await status.start(f"🔍 Ищу код в аккаунте {phone}...")
+    
+    def progress(scanned, total):
+        status.update(f"🔍 Ищу код в аккаунте {phone}: просмотрено {scanned} из {total} чатов...")
+    
+    try:
+        # Поиск идет в этом процессе или в воркере, владеющем аккаунтом;
+        # одновременные запросы того же аккаунта получают его же результат
+        result = await code_lookups.run(
+            ('get_code', phone), lambda: account_jobs.get_code(phone, on_progress=progress)
+        )
+        if result is None:
+            await status.finish("❌ Не удалось загрузить сессию аккаунта")
             return
+        await storage.mark_used(phone)
         
-        # Берем первый диалог (самый последний активный)
-        first_chat = dialogs[0]
-        chat_name = get_chat_name(first_chat.chat)
-        
-        # Получаем последние 20 сообщений из этого чата
-        messages = []
-        async for msg in account_client.get_chat_history(first_chat.chat.id, limit=20):
-            if msg.text or msg.caption:
-                messages.append(msg)
-        
-        if not messages:
-            await message.reply_text(f"ℹ️ В чате {chat_name} нет текстовых сообщений")
-            await account_client.disconnect()
+        if not result.dialogs:
+            await status.finish("❌ Нет диалогов в этом аккаунте")
             return
         
-        # Ищем код в сообщениях (от последнего к первому)
-        found_code = None
-        code_message = None
-        
-        code_patterns = [
-            r'\b\d{4,6}\b',  # 4-6 цифр подряд
-            r'код[:\s]*(\d{4,6})',  # код: 123456
-            r'code[:\s]*(\d{4,6})',  # code: 123456
-            r'(\d{4,6})\s+[-\w]+',  # 123456 - код
-        ]
-        
-        for msg in messages:
-            text = msg.text or msg.caption
-            if not text:
-                continue
-            
-            text_lower = text.lower()
-            
-            # Проверяем разные паттерны
-            for pattern in code_patterns:
-                match = re.search(pattern, text, re.IGNORECASE)
-                if match:
-                    # Если группа захвата есть, берем её, иначе все совпадение
-                    found_code = match.group(1) if match.groups() else match.group(0)
-                    code_message = text
-                    break
-            
-            if found_code:
-                # Если нашли что-то похожее на код, проверяем контекст
-                if re.match(r'^\d{4,6}$', found_code):
-                    # Если это просто 4-6 цифр, проверяем есть ли рядом слова "код" или "code"
-                    if 'код' in text_lower or 'code' in text_lower or 'пароль' in text_lower:
-                        break
-                    else:
-                        # Если нет контекста, продолжаем искать
-                        found_code = None
-                        continue
-                else:
-                    break
-        
-        if found_code:
+        if result.code:
             # Формируем ответ
             response = (
                 f"✅ **Найден код!**\n\n"
                 f"📱 **Аккаунт:** `{phone}`\n"
-                f"💬 **Чат:** {chat_name}\n"
-                f"🔑 **Код:** `{found_code}`\n\n"
-                f"📝 **Сообщение:**\n{code_message[:200]}"
+                f"💬 **Чат:** {result.chat_name}\n"
+                f"🔑 **Код:** `{result.code}`\n\n"
+                f"📝 **Сообщение:**\n{result.text[:200]}"
             )
-            if len(code_message) > 200:
+            if len(result.text) > 200:
                 response += "..."
             
-            await message.reply_text(response)
+            await status.finish(response)
         else:
-            await message.reply_text(
-                f"❌ Код не найден в последних сообщениях чата {chat_name}\n"
+            await status.finish(
+                f"❌ Код не найден в последних сообщениях {result.scanned} чатов\n"
                 f"Проверьте другие чаты вручную через Telegram"
             )
         
-        await account_client.disconnect()
-        
+    except FloodWait as e:
+        metrics.record_error("process_get_code", e)
+        await storage.mark_used(phone, error=repr(e))
+        await status.finish(f"⏳ Telegram ограничил запросы аккаунта, повторите через {e.value} сек.")
     except Exception as e:
-        await message.reply_text(f"❌ Ошибка при поиске кода: {str(e)}")
+        metrics.record_error("process_get_code", e)
+        await storage.mark_used(phone, error=repr(e))
+        await status.finish(f"❌ Ошибка при поиске кода: {str(e)}")
 
+@metrics.timed("create_channel")
+@slow_log.track("create_channel")
 async def create_channel(message: Message, phone: str, title: str, description: str = None):
     """Создание канала от имени аккаунта"""
+    status = StatusMessage(message, min_interval=STATUS_EDIT_INTERVAL, show_after=STATUS_SHOW_AFTER)
+    await status.start("⏳ Создаю канал...")
+    
     try:
-        # Получаем клиент для аккаунта
-        account_client = get_account_client(phone)
-        if not account_client:
-            await message.reply_text("❌ Не удалось загрузить сессию аккаунта")
+        # Создаем канал и получаем ссылку на него
+        link = await account_jobs.create_channel(phone, title, description)
+        if link is None:
+            await status.finish("❌ Не удалось загрузить сессию аккаунта")
             return
+        await storage.mark_used(phone)
         
-        await account_client.connect()
-        
-        # Создаем канал
-        channel = await account_client.create_channel(
-            title=title,
-            description=description
-        )
-        
-        # Получаем ссылку на канал
-        if channel.username:
-            link = f"https://t.me/{channel.username}"
-        else:
-            # Если нет юзернейма, создаем пригласительную ссылку
-            invite_link = await account_client.create_chat_invite_link(channel.id)
-            link = invite_link.invite_link
-        
-        await message.reply_text(
+        await status.finish(
             f"✅ **Канал успешно создан!**\n\n"
             f"📢 **Название:** {title}\n"
             f"🔗 **Ссылка:** {link}\n"
             f"📱 **Создан от:** `{phone}`"
         )
-        
-        await account_client.disconnect()
-        
+
+    except FloodWait as e:
+        metrics.record_error("create_channel", e)
+        await storage.mark_used(phone, error=repr(e))
+        await status.finish(f"⏳ Telegram ограничил запросы аккаунта, повторите через {e.value} сек.")
     except Exception as e:
-        await message.reply_text(f"❌ Ошибка при создании канала: {str(e)}")
-
-def get_chat_name(chat):
-    """Получить название чата"""
-    if chat.type == ChatType.PRIVATE:
-        return f"{chat.first_name or ''} {chat.last_name or ''}".strip() or "Пользователь"
-    elif chat.type == ChatType.GROUP or chat.type == ChatType.SUPERGROUP:
-        return chat.title or "Группа"
-    elif chat.type == ChatType.CHANNEL:
-        return chat.title or "Канал"
+        metrics.record_error("create_channel", e)
+        await storage.mark_used(phone, error=repr(e))
+        await status.finish(f"❌ Ошибка при создании канала: {str(e)}")
+
+# Заголовки страниц списка аккаунтов по действию
+ACCOUNT_PAGE_TITLES = {
+    'list': "📱 **Список аккаунтов:**",
+    'code': "🔍 Выберите аккаунт для поиска кода:",
+    'chan': "📢 Выберите аккаунт для создания канала:",
+}
+
+def command_prefix(message: Message):
+    """Начало номера из аргумента команды (/get_code +7912)"""
+    if len(message.command) < 2:
+        return ''
+    # Не длиннее номера ("+" и до 15 цифр): префикс попадает в callback_data (до 64 байт)
+    return re.sub(r'[^\d+]', '', message.command[1])[:16]
+
+def render_accounts_page(action, rows, prefix, has_prev, has_next):
+    """Текст и клавиатура одной страницы аккаунтов"""
+    lines = [ACCOUNT_PAGE_TITLES[action]]
+    if prefix:
+        lines.append(f"🔎 Поиск: `{prefix}`")
+    
+    keyboard = []
+    if action == 'list':
+        lines.append("")
+        lines.extend(f"`{phone}`" for _, phone in rows)
     else:
-        return "Чат"
+        keyboard.extend(
+            [InlineKeyboardButton(phone, callback_data=f"sel:{action}:{phone}")]
+            for _, phone in rows
+        )
+    
+    # Навигация по ключу: id первого/последнего аккаунта на странице
+    nav = []
+    if has_prev:
+        nav.append(InlineKeyboardButton("⬅️ Назад", callback_data=f"pg:{action}:<{rows[0][0]}:{prefix}"))
+    if has_next:
+        nav.append(InlineKeyboardButton("Вперед ➡️", callback_data=f"pg:{action}:>{rows[-1][0]}:{prefix}"))
+    if nav:
+        keyboard.append(nav)
+    
+    return "\n".join(lines), InlineKeyboardMarkup(keyboard) if keyboard else None
+
+# Таблица обработчиков шагов диалога
+STATE_HANDLERS = {
+    State.WAITING_PHONE: process_phone_input,
+    State.WAITING_CODE: process_code_input,
+    State.WAITING_PASSWORD: process_password_input,
+    State.CREATING_CHANNEL_TITLE: process_channel_title,
+    State.CREATING_CHANNEL_DESCRIPTION: process_channel_description,
+}
 
 # Запуск бота
 if __name__ == "__main__":
+    launched = time.monotonic()
     print("🚀 Запуск бота...")
-    init_db()
-    print("✅ База данных инициализирована")
-    print("🤖 Бот запущен. Нажмите Ctrl+C для остановки")
-    app.run()
+    app.loop.run_until_complete(storage.init_db())
+    if storage.migrations_applied:
+        print(f"🗂 Применены миграции базы: {', '.join(map(str, storage.migrations_applied))}")
+    print(f"✅ База данных инициализирована, аккаунтов: {len(storage.index)}")
+    if METRICS_PORT:
+        app.loop.run_until_complete(metrics.start_server(port=METRICS_PORT))
+        print(f"📊 Метрики: http://127.0.0.1:{METRICS_PORT}/metrics")
+    if ACCOUNT_WORKERS:
+        app.loop.run_until_complete(account_jobs.start())
+        print(f"⚙️ Запущено воркеров аккаунтов: {ACCOUNT_WORKERS}; /listen выключен, "
+              f"метрики MTProto воркеров не собираются")
+    # Прогрев идет в фоне, команды принимаются сразу
+    hot_accounts = storage.index.recently_used(min(PREWARM_ACCOUNTS, ACCOUNT_POOL_SIZE))
+    print(f"🔥 Прогрев пула: {len(hot_accounts)} аккаунтов")
+    app.loop.run_until_complete(pool_warmer.start(hot_accounts))
+    if HEALTH_CHECK_INTERVAL:
+        app.loop.run_until_complete(health_checker.start())
+    if PROFILE_ON_START:
+        async def profile_startup():
+            path = await profiler.run(PROFILE_ON_START)
+            print(f"🔬 Профиль первых {PROFILE_ON_START}с: {path}")
+        profile_task = app.loop.create_task(profile_startup())
+    app.loop.run_until_complete(app.start())
+    print(f"🤖 Бот запущен за {time.monotonic() - launched:.1f}с. Нажмите Ctrl+C для остановки")
+    app.loop.run_until_complete(idle())
+    app.loop.run_until_complete(app.stop())
+    app.loop.run_until_complete(pool_warmer.close())
+    if ACCOUNT_WORKERS:
+        app.loop.run_until_complete(account_jobs.close())
+    app.loop.run_until_complete(health_checker.close())
+    app.loop.run_until_complete(login_sessions.close_all())
+    app.loop.run_until_complete(code_listener.close())
+    app.loop.run_until_complete(account_pool.close())
+    app.loop.run_until_complete(storage.close())
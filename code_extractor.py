@@ -0,0 +1,133 @@
+import re
+from typing import NamedTuple, Optional, Tuple
+
+# Слова, рядом с которыми обычно стоит код подтверждения
+DEFAULT_KEYWORDS = (
+    'код', 'пароль', 'code', 'password', 'passcode', 'pin', 'otp',
+)
+
+# Короткие ключевые слова, которые считаются только целым словом
+# (иначе pin находится в "shipping" и "opinion")
+DEFAULT_WHOLE_WORDS = ('pin', 'otp')
+
+
+class CodeMatch(NamedTuple):
+    """Найденный код и его положение в тексте"""
+    code: str
+    span: Tuple[int, int]
+    score: float
+    text: str
+
+
+class CodeExtractor:
+    """Поиск кодов подтверждения в тексте сообщений.
+
+    Шаблоны компилируются один раз. Одна регулярка находит кандидатов
+    (4-6 цифр или код вида ``123-456``, не часть слова или длинного
+    числа), затем ищутся ключевые слова (с начала слова, а
+    ``whole_words`` - только целым словом): без кандидатов или ключевых
+    слов текст сразу отбрасывается. Каждый кандидат оценивается по близости к ближайшему ключевому слову: чем ближе, тем
+    выше оценка (0..1), код перед словом весит меньше, чем после него.
+    """
+
+    def __init__(self, keywords=DEFAULT_KEYWORDS, min_digits=4, max_digits=6,
+                 window=80, min_score=0.0, whole_words=DEFAULT_WHOLE_WORDS):
+        self.min_digits = min_digits
+        self.max_digits = max_digits
+        self.window = window  # максимальное расстояние до ключевого слова
+        self.min_score = min_score
+        self.keywords = tuple(k.lower() for k in keywords)
+        self.whole_words = frozenset(k.lower() for k in whole_words)
+        self._keywords_ignorecase = re.compile(
+            r'(?<!\w)(?:' + '|'.join(
+                re.escape(k) + (r'(?!\w)' if k in self.whole_words else '') for k in self.keywords
+            ) + ')',
+            re.IGNORECASE
+        )
+        # Код целиком или из двух равных половин через дефис (123-456), не часть
+        # слова и не начало более длинной последовательности ("1234-5678").
+        # Шаблон начинается с цифры, чтобы regex-движок быстро пропускал текст
+        # до нее, а проверка "не часть слова" - сразу после первой цифры
+        rest = [
+            rf'\d{{{n - 1}}}-\d{{{n}}}' for n in range(max_digits // 2, 0, -1)
+            if min_digits <= n * 2 <= max_digits
+        ]
+        rest.append(rf'\d{{{min_digits - 1},{max_digits - 1}}}')
+        self._candidates = re.compile(r'\d(?<!\w\d)(?:' + '|'.join(rest) + r')(?!\w|-+\d)')
+
+    def extract(self, text: str) -> Optional[CodeMatch]:
+        """Лучший кандидат в тексте или None"""
+        if not text:
+            return None
+        # Без кандидатов (в обычной переписке цифр почти нет) ключевые слова не ищем
+        candidates = list(self._candidates.finditer(text))
+        if not candidates:
+            return None
+
+        lowered = text.lower()
+        if len(lowered) == len(text):
+            keywords = self._find_keywords(lowered)
+        else:
+            # lower() изменил длину текста - позиции бы сместились
+            keywords = [m.span() for m in self._keywords_ignorecase.finditer(text)]
+        if not keywords:
+            return None
+
+        best = None
+        best_score = self.min_score
+        window = self.window
+        for match in candidates:
+            start, end = match.span()
+            if start and text[start - 1] == '-' and _after_number(text, start - 1):
+                continue  # продолжение числа через дефисы: "12--3456"
+            score = 0.0
+            for kw_start, kw_end in keywords:
+                if kw_end <= start:
+                    distance, weight = start - kw_end, 1.0  # "код: 12345"
+                elif end <= kw_start:
+                    distance, weight = kw_start - end, 0.8  # "12345 - ваш код"
+                else:
+                    continue
+                if distance <= window:
+                    score = max(score, weight / (1 + distance / 10))
+            if score > best_score:
+                best, best_score = match, score
+
+        if best is None:
+            return None
+        return CodeMatch(best.group().replace('-', ''), best.span(), best_score, text)
+
+    def _find_keywords(self, lowered):
+        """Позиции ключевых слов: поиск подстрок быстрее альтернации в регулярке"""
+        spans = []
+        text_len = len(lowered)
+        for keyword in self.keywords:
+            whole = keyword in self.whole_words
+            pos = lowered.find(keyword)
+            while pos != -1:
+                end = pos + len(keyword)
+                # Ключевое слово - начало слова, а не его середина
+                if not (pos and _is_word_char(lowered[pos - 1])) and not (
+                        whole and end < text_len and _is_word_char(lowered[end])):
+                    spans.append((pos, end))
+                pos = lowered.find(keyword, end)
+        return spans
+
+    def find(self, texts) -> Optional[CodeMatch]:
+        """Первый текст (по порядку), в котором найден код"""
+        for text in texts:
+            match = self.extract(text)
+            if match:
+                return match
+        return None
+
+
+def _is_word_char(char):
+    return char.isalnum() or char == '_'
+
+
+def _after_number(text, pos):
+    """Перед дефисами, заканчивающимися в pos, стоит цифра"""
+    while pos >= 0 and text[pos] == '-':
+        pos -= 1
+    return pos >= 0 and text[pos].isdigit()
@@ -0,0 +1,145 @@
+import asyncio
+import time
+from collections import deque
+from contextlib import suppress
+from typing import NamedTuple, Optional
+
+from pyrogram import filters, raw
+from pyrogram.handlers import MessageHandler
+
+
+class CapturedCode(NamedTuple):
+    """Код, пойманный из входящего сообщения"""
+    code: str
+    chat_name: str
+    timestamp: float  # time.time() момента получения
+    excerpt: str
+
+
+class CodeListener:
+    """Прием кодов из входящих сообщений отслеживаемых аккаунтов.
+
+    Клиент отслеживаемого аккаунта закрепляется в пуле и остается
+    подписан на обновления. Каждое входящее сообщение проверяется
+    экстрактором, а найденные коды складываются в кольцевой буфер
+    аккаунта (последние ``buffer_size`` кодов).
+
+    on_connect/on_disconnect нужно вызывать из хуков пула: после
+    переподключения клиента обработчик подключается заново, а отключенный
+    пулом аккаунт перестает считаться отслеживаемым.
+    """
+
+    def __init__(self, pool, extractor, chat_name, buffer_size=10, excerpt_length=200):
+        self._pool = pool
+        self._extractor = extractor
+        self._chat_name = chat_name  # функция chat -> название
+        self._buffers = {}  # {phone: deque[CapturedCode]}
+        self._handlers = {}  # {phone: (client, handler)}
+        self._locks = {}  # {phone: asyncio.Lock} - listen/unlisten одного аккаунта по очереди
+        self.buffer_size = buffer_size
+        self.excerpt_length = excerpt_length
+
+    def listening(self):
+        return list(self._handlers)
+
+    def _lock(self, phone):
+        return self._locks.setdefault(phone, asyncio.Lock())
+
+    async def listen(self, phone):
+        """Начать отслеживание аккаунта. False, если сессия не найдена"""
+        async with self._lock(phone):
+            if phone in self._handlers:
+                return True
+
+            client = await self._pool.pin(phone)
+            if client is None:
+                return False
+
+            self._buffers.setdefault(phone, deque(maxlen=self.buffer_size))
+            handler = MessageHandler(self._make_callback(phone), filters.incoming)
+            try:
+                await self._subscribe(client, handler)
+            except BaseException:
+                await self._pool.unpin(phone)
+                raise
+
+            self._handlers[phone] = (client, handler)
+            return True
+
+    async def unlisten(self, phone):
+        """Прекратить отслеживание аккаунта"""
+        async with self._lock(phone):
+            entry = self._handlers.pop(phone, None)
+            if entry is None:
+                return False
+
+            client, handler = entry
+            client.remove_handler(handler)
+            if client.is_initialized:
+                await client.terminate()
+            await self._pool.unpin(phone)
+            return True
+
+    async def on_connect(self, phone, client):
+        """Клиент отслеживаемого аккаунта переподключен: подписаться снова.
+
+        terminate() при переподключении убирает обработчики диспетчера.
+        Если подписаться не удалось, аккаунт перестает отслеживаться.
+        """
+        entry = self._handlers.get(phone)
+        if entry is None:
+            return
+        if entry[0] is not client:
+            # Пул заменил клиент закрепленной записи (сессия сменилась)
+            entry = self._handlers[phone] = (client, entry[1])
+        try:
+            await self._subscribe(client, entry[1])
+        except Exception as e:
+            print(f"⚠️ Отслеживание {phone} остановлено: {e!r}")
+            del self._handlers[phone]
+            # Идет выдача клиента, так что снятие закрепления его не отключит
+            await self._pool.unpin(phone)
+
+    async def on_disconnect(self, phone, client):
+        """Пул отключает клиент: аккаунт больше не отслеживается"""
+        entry = self._handlers.get(phone)
+        if entry is not None and entry[0] is client:
+            del self._handlers[phone]
+            with suppress(Exception):
+                client.remove_handler(entry[1])
+
+    async def _subscribe(self, client, handler):
+        client.add_handler(handler)
+        if not client.is_initialized:
+            await client.initialize()
+        # Сервер начинает присылать обновления после запроса состояния
+        await client.invoke(raw.functions.updates.GetState())
+
+    async def close(self):
+        for phone in list(self._handlers):
+            await self.unlisten(phone)
+
+    def latest(self, phone, max_age) -> Optional[CapturedCode]:
+        """Последний пойманный код, если он не старше max_age секунд"""
+        buffer = self._buffers.get(phone)
+        if not buffer:
+            return None
+        captured = buffer[-1]
+        if time.time() - captured.timestamp > max_age:
+            return None
+        return captured
+
+    def _make_callback(self, phone):
+        async def on_message(client, message):
+            match = self._extractor.extract(message.text or message.caption)
+            if match:
+                excerpt = match.text[:self.excerpt_length]
+                if len(match.text) > self.excerpt_length:
+                    excerpt += "..."
+                self._buffers[phone].append(CapturedCode(
+                    code=match.code,
+                    chat_name=self._chat_name(message.chat),
+                    timestamp=time.time(),
+                    excerpt=excerpt
+                ))
+        return on_message
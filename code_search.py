@@ -0,0 +1,218 @@
+import asyncio
+from contextlib import aclosing
+from typing import NamedTuple, Optional
+
+from pyrogram.errors import FloodWait
+
+import request_timing
+from code_extractor import CodeMatch
+
+# Служебные аккаунты Telegram, присылающие коды входа
+SERVICE_CHAT_IDS = {777000, 42777}
+
+
+class HistoryCursor(NamedTuple):
+    """Докуда просмотрена история чата и что в ней найдено"""
+    last_message_id: int
+    match: Optional[CodeMatch]
+
+    @classmethod
+    def from_row(cls, row):
+        """Из строки (last_message_id, code, span_start, span_end, score, text)"""
+        last_message_id, code, span_start, span_end, score, text = row
+        match = CodeMatch(code, (span_start, span_end), score, text) if code else None
+        return cls(last_message_id, match)
+
+    def to_row(self):
+        match = self.match
+        if match is None:
+            return (self.last_message_id, None, None, None, None, None)
+        return (self.last_message_id, match.code, match.span[0], match.span[1], match.score, match.text)
+
+
+class SearchResult(NamedTuple):
+    """Итог поиска кода по диалогам аккаунта"""
+    match: Optional[CodeMatch]
+    chat: object  # чат, в котором найден код (или None)
+    dialogs: int  # сколько диалогов получено
+    scanned: int  # в скольких диалогах успели просмотреть историю
+    cursors: Optional[dict] = None  # обновленные курсоры {chat_id: HistoryCursor}
+    chat_ids: tuple = ()  # id чатов верхних диалогов - курсоры остальных уже не нужны
+
+
+def dialog_priority(dialog):
+    """Ключ сортировки: сначала служебный чат, непрочитанные, проверенные отправители"""
+    chat = dialog.chat
+    return (
+        chat.id not in SERVICE_CHAT_IDS,
+        not dialog.unread_messages_count,
+        not (getattr(chat, 'is_verified', False) or getattr(chat, 'is_support', False)),
+    )
+
+
+class CodeSearch:
+    """Поиск кода сразу в нескольких диалогах аккаунта.
+
+    Истории ``dialogs_limit`` верхних диалогов загружаются параллельно (не
+    больше ``concurrency`` одновременно), в порядке dialog_priority.
+    Побеждает самый приоритетный диалог с кодом с оценкой не ниже
+    ``confident_score``: такая находка принимается, когда все диалоги
+    выше нее по приоритету просмотрены, а загрузки ниже нее отменяются
+    сразу. Без уверенных находок побеждает лучшая оценка.
+
+    Ошибка загрузки одного диалога (ChannelPrivate, исчерпанные повторы
+    FloodWait и т.п.) не прерывает поиск: диалог считается без кода.
+    Ошибка пробрасывается, только если не загрузился ни один диалог или
+    FloodWait пришел на самый приоритетный.
+
+    С курсорами прошлого поиска (HistoryCursor по chat_id) чат без новых
+    сообщений не загружается, а в остальных просматриваются только
+    сообщения новее курсора.
+    """
+
+    def __init__(self, extractor, dialogs_limit=10, history_limit=20, concurrency=4,
+                 confident_score=0.5):
+        self._extractor = extractor
+        self.dialogs_limit = dialogs_limit
+        self.history_limit = history_limit
+        self.concurrency = concurrency
+        self.confident_score = confident_score
+        self.failed_dialogs = 0  # диалоги, историю которых загрузить не удалось
+
+    async def search(self, client, cursors=None, dialogs=None, on_progress=None) -> SearchResult:
+        """Найти код; dialogs - уже полученные верхние диалоги (иначе загружаются).
+
+        on_progress(scanned, total) вызывается после каждого просмотренного диалога.
+        """
+        cursors = cursors or {}
+        if dialogs is None:
+            dialogs = []
+            async for dialog in client.get_dialogs(limit=self.dialogs_limit):
+                dialogs.append(dialog)
+        if not dialogs:
+            return SearchResult(None, None, 0, 0, {})
+
+        # sorted() устойчива: при равном приоритете остается порядок по свежести
+        ranked = sorted(dialogs, key=dialog_priority)
+        semaphore = asyncio.Semaphore(self.concurrency)
+        # Ранг лучшей уверенной находки: диалоги ниже по приоритету не загружаем
+        cutoff = [len(ranked)]
+        updated = {}  # {chat_id: HistoryCursor} - заполняют _scan_dialog
+        tasks = [
+            asyncio.create_task(self._scan_dialog(
+                client, rank, dialog, semaphore, cutoff, cursors.get(dialog.chat.id), updated
+            ))
+            for rank, dialog in enumerate(ranked)
+        ]
+        task_ranks = {task: rank for rank, task in enumerate(tasks)}
+
+        matches = [None] * len(ranked)  # находки по рангу
+        finished = [False] * len(ranked)
+        frontier = 0  # все диалоги с меньшим рангом просмотрены
+        winner = None  # ранг принятой уверенной находки
+        scanned = 0
+        errors = []
+        pending = set(tasks)
+        try:
+            while pending and winner is None:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in sorted(done, key=task_ranks.get):
+                    if task.cancelled():
+                        continue
+                    rank, dialog, match, error = task.result()
+                    finished[rank] = True
+                    scanned += 1
+                    if on_progress is not None:
+                        on_progress(scanned, len(ranked))
+                    if error is not None:
+                        if rank == 0 and isinstance(error, FloodWait):
+                            raise error  # самый вероятный диалог недоступен - ответ без него ненадежен
+                        errors.append(error)
+                        self.failed_dialogs += 1
+                        continue
+                    matches[rank] = match
+                    if match is not None and match.score >= self.confident_score:
+                        # Менее приоритетные диалоги уже не победят
+                        for other in pending:
+                            if task_ranks[other] > rank:
+                                other.cancel()
+
+                # Уверенная находка принимается, когда все диалоги выше нее просмотрены
+                while frontier < len(ranked) and finished[frontier]:
+                    match = matches[frontier]
+                    if match is not None and match.score >= self.confident_score:
+                        winner = frontier
+                        break
+                    frontier += 1
+        finally:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+        if winner is not None:
+            best = (matches[winner], winner, ranked[winner])
+        else:
+            best = None  # (match, rank, dialog)
+            for rank, match in enumerate(matches):
+                # Лучше оценка, при равной - приоритетнее диалог
+                if match is not None and (best is None or match.score > best[0].score):
+                    best = (match, rank, ranked[rank])
+
+        chat_ids = tuple(dialog.chat.id for dialog in dialogs)
+        if best is None:
+            if errors and len(errors) == len(ranked):
+                raise errors[0]
+            return SearchResult(None, None, len(dialogs), scanned, updated, chat_ids)
+        return SearchResult(best[0], best[2].chat, len(dialogs), scanned, updated, chat_ids)
+
+    async def _scan_dialog(self, client, rank, dialog, semaphore, cutoff, cursor, updated):
+        """(rank, dialog, match, error) - ошибка загрузки возвращается, а не пробрасывается"""
+        try:
+            match = await self._scan_history(client, rank, dialog, semaphore, cutoff, cursor, updated)
+        except Exception as e:
+            return rank, dialog, None, e
+        return rank, dialog, match, None
+
+    async def _scan_history(self, client, rank, dialog, semaphore, cutoff, cursor, updated):
+        """Найти код в диалоге: по курсору или загрузив новые сообщения.
+
+        Если история загружалась, в updated[chat_id] пишется новый курсор.
+        """
+        chat_id = dialog.chat.id
+        top = dialog.top_message
+        if cursor is not None and top is not None and top.id == cursor.last_message_id:
+            # Новых сообщений нет - результат прошлого просмотра еще верен
+            match = cursor.match
+            if match and match.score >= self.confident_score:
+                cutoff[0] = min(cutoff[0], rank)
+            return match
+
+        async with semaphore:
+            if rank > cutoff[0]:
+                return None
+            texts = []
+            newest_id = None
+            seen = 0
+            async with aclosing(client.get_chat_history(chat_id, limit=self.history_limit)) as history:
+                async for msg in history:
+                    if newest_id is None:
+                        newest_id = msg.id
+                        if cursor is not None and msg.id < cursor.last_message_id:
+                            # Сообщения после курсора удалены - просматриваем все окно
+                            cursor = None
+                    if cursor is not None and msg.id <= cursor.last_message_id:
+                        break  # дальше уже просмотренные сообщения
+                    seen += 1
+                    text = msg.text or msg.caption
+                    if text:
+                        texts.append(text)
+            with request_timing.phase('extraction'):
+                match = self._extractor.find(texts)
+            if match is None and cursor is not None and seen < self.history_limit:
+                # Среди новых кода нет, а прошлая находка еще в окне последних сообщений
+                match = cursor.match
+            if newest_id is not None:
+                updated[chat_id] = HistoryCursor(newest_id, match)
+            if match and match.score >= self.confident_score:
+                cutoff[0] = min(cutoff[0], rank)
+        return match
@@ -0,0 +1,130 @@
+import asyncio
+import time
+from contextlib import suppress
+
+from pyrogram.errors import Unauthorized
+
+# Статус аккаунта, сессия которого отозвана или удалена (401 от Telegram)
+REVOKED_STATUS = 'revoked'
+
+
+async def check_session(pool, factory, phone, timeout=30):
+    """Проверить одну сессию: (новый статус или None, текст ошибки или None)"""
+    try:
+        await asyncio.wait_for(_get_me(pool, factory, phone), timeout)
+    except Unauthorized as e:
+        return REVOKED_STATUS, repr(e)
+    except Exception as e:
+        # Сеть, FloodWait и т.п. - сессия может быть жива, статус не меняем
+        return None, repr(e)
+    return None, None
+
+
+async def _get_me(pool, factory, phone):
+    # Клиент уже в пуле - проверяем через него без нового подключения
+    if phone in pool:
+        async with pool.acquire(phone) as client:
+            if client is not None:
+                await client.get_me()
+                return
+
+    client = await factory(phone)
+    if client is None:
+        return
+    try:
+        await client.connect()
+        await client.get_me()
+    finally:
+        with suppress(Exception):
+            if client.is_connected:
+                await client.disconnect()
+
+
+class SessionHealthChecker:
+    """Фоновая проверка сохраненных сессий.
+
+    Раз в ``interval`` секунд берет до ``batch_size`` активных аккаунтов,
+    дольше всех не проверявшихся, и параллельно (не больше
+    ``concurrency`` одновременно) делает connect + get_me. Отозванные
+    сессии получают статус REVOKED_STATUS и пропадают из списков
+    аккаунтов; результаты всей проверки пишутся в базу одной транзакцией.
+
+    Проверку и вытеснение из пула выполняет ``jobs`` (jobs.LocalJobs или
+    workers.WorkerPool) - там, где живут клиенты аккаунта, чтобы не
+    открывать второе подключение с той же сессией.
+    """
+
+    def __init__(self, storage, jobs, interval=600, batch_size=50, concurrency=5, timeout=30):
+        self._storage = storage
+        self._jobs = jobs
+        self._task = None
+        self.interval = interval
+        self.batch_size = batch_size
+        self.concurrency = concurrency
+        self.timeout = timeout  # секунды на проверку одного аккаунта
+        self.checked = 0
+        self.revoked = 0
+        self.failed = 0
+        self.last_sweep_duration = None
+
+    def due(self):
+        """Активные аккаунты для следующей проверки: сначала непроверенные"""
+        index = self._storage.index
+        records = [index.get(phone) for phone in index.active_phones()]
+        records.sort(key=lambda r: r.last_checked_at or '')
+        return [r.phone for r in records[:self.batch_size]]
+
+    async def check(self, phone):
+        """Проверить одну сессию: (новый статус или None, текст ошибки или None)"""
+        try:
+            status, error = await self._jobs.check_session(phone, self.timeout)
+        except Exception as e:
+            return None, repr(e)  # воркер недоступен
+        return status, error
+
+    async def sweep(self):
+        """Проверить очередную партию аккаунтов, вернуть число отозванных"""
+        phones = self.due()
+        if not phones:
+            return 0
+
+        started = time.monotonic()
+        semaphore = asyncio.Semaphore(self.concurrency)
+
+        async def bounded(phone):
+            async with semaphore:
+                return phone, *await self.check(phone)
+
+        results = await asyncio.gather(*(bounded(phone) for phone in phones))
+        await self._storage.record_health_checks(results)
+
+        revoked = [phone for phone, status, _ in results if status == REVOKED_STATUS]
+        for phone in revoked:
+            with suppress(Exception):
+                await self._jobs.evict(phone)
+
+        self.checked += len(results)
+        self.revoked += len(revoked)
+        self.failed += sum(1 for _, status, error in results if error and status is None)
+        self.last_sweep_duration = time.monotonic() - started
+        return len(revoked)
+
+    async def start(self):
+        """Запустить периодическую проверку в текущем цикле событий"""
+        if self._task is None or self._task.done():
+            self._task = asyncio.get_running_loop().create_task(self._loop())
+
+    async def _loop(self):
+        while True:
+            try:
+                await self.sweep()
+            except Exception as e:
+                print(f"Ошибка проверки сессий: {e!r}")
+            await asyncio.sleep(self.interval)
+
+    async def close(self):
+        if self._task is not None:
+            self._task.cancel()
+            with suppress(asyncio.CancelledError):
+                await self._task
+            self._task = None
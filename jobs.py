@@ -0,0 +1,92 @@
+from typing import NamedTuple, Optional
+
+from pyrogram.enums import ChatType
+
+from code_search import HistoryCursor
+from health_checker import check_session
+
+
+class CodeOutcome(NamedTuple):
+    """Результат поиска кода, пригодный для передачи между процессами"""
+    dialogs: int
+    scanned: int
+    code: Optional[str]
+    text: Optional[str]
+    chat_name: Optional[str]
+
+
+def get_chat_name(chat):
+    """Получить название чата"""
+    if chat.type == ChatType.PRIVATE:
+        return f"{chat.first_name or ''} {chat.last_name or ''}".strip() or "Пользователь"
+    elif chat.type == ChatType.GROUP or chat.type == ChatType.SUPERGROUP:
+        return chat.title or "Группа"
+    elif chat.type == ChatType.CHANNEL:
+        return chat.title or "Канал"
+    else:
+        return "Чат"
+
+
+class LocalJobs:
+    """Операции с аккаунтами в текущем процессе.
+
+    Тот же интерфейс у workers.WorkerPool, который выполняет их в
+    процессах-воркерах; bot.py работает с любым из них.
+    Методы возвращают None, если сессии аккаунта нет.
+    ``factory`` (async phone -> Client) нужен для проверки сессий вне пула.
+    """
+
+    def __init__(self, pool, search, storage, peer_cache=None, factory=None):
+        self._pool = pool
+        self._search = search
+        self._storage = storage
+        self._peer_cache = peer_cache
+        self._factory = factory
+
+    async def get_code(self, phone, on_progress=None):
+        """Найти код в верхних диалогах аккаунта (on_progress - см. CodeSearch.search)"""
+        async with self._pool.acquire(phone) as client:
+            if client is None:
+                return None
+            # Просматриваем верхние диалоги параллельно, начиная с самых вероятных;
+            # чаты без новых сообщений с прошлого поиска не загружаем
+            rows = await self._storage.get_history_cursors(phone)
+            cursors = {chat_id: HistoryCursor.from_row(row) for chat_id, row in rows.items()}
+            dialogs = None
+            if self._peer_cache is not None:
+                dialogs = await self._peer_cache.get_dialogs(phone, client, self._search.dialogs_limit)
+            result = await self._search.search(client, cursors, dialogs, on_progress)
+        await self._storage.save_history_cursors(
+            phone, {chat_id: cursor.to_row() for chat_id, cursor in result.cursors.items()},
+            keep=result.chat_ids
+        )
+
+        match = result.match
+        if match is None:
+            return CodeOutcome(result.dialogs, result.scanned, None, None, None)
+        return CodeOutcome(result.dialogs, result.scanned, match.code, match.text, get_chat_name(result.chat))
+
+    async def create_channel(self, phone, title, description=None):
+        """Создать канал, вернуть ссылку на него"""
+        async with self._pool.acquire(phone) as client:
+            if client is None:
+                return None
+            channel = await client.create_channel(title=title, description=description)
+
+            if channel.username:
+                return f"https://t.me/{channel.username}"
+            # Если нет юзернейма, создаем пригласительную ссылку
+            invite_link = await client.create_chat_invite_link(channel.id)
+            return invite_link.invite_link
+
+    async def warm(self, phone):
+        """Подключить клиент аккаунта заранее"""
+        return await self._pool.warm(phone)
+
+    async def check_session(self, phone, timeout=30):
+        """Проверить сессию: (новый статус или None, текст ошибки или None)"""
+        return await check_session(self._pool, self._factory, phone, timeout)
+
+    async def evict(self, phone):
+        """Отключить клиент аккаунта и убрать его из пула"""
+        await self._pool.evict(phone)
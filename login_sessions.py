@@ -0,0 +1,98 @@
+import asyncio
+import time
+from contextlib import suppress
+
+from states import LoginState
+
+
+class LoginSessions:
+    """Незавершенные добавления аккаунтов (/add_account).
+
+    Каждой сессии принадлежит временный клиент. Одновременно открыто не
+    больше ``max_pending`` сессий; брошенные дольше ``ttl`` секунд
+    отключаются фоновой задачей, а повторный /add_account закрывает
+    предыдущую сессию пользователя.
+    """
+
+    def __init__(self, states, max_pending=50, ttl=600, sweep_interval=30):
+        self._states = states  # общий словарь user_states
+        self._sessions = {}  # {user_id: LoginState}
+        self._sweeper = None
+        self.max_pending = max_pending
+        self.ttl = ttl
+        self.sweep_interval = sweep_interval
+        self.started = 0
+        self.completed = 0
+        self.expired = 0
+        self.rejected = 0
+
+    def __len__(self):
+        return len(self._sessions)
+
+    @property
+    def connected(self):
+        """Сколько временных клиентов сейчас подключено"""
+        return sum(1 for s in self._sessions.values() if s.temp_client.is_connected)
+
+    async def start(self, user_id, temp_client):
+        """Открыть сессию входа. None, если достигнут лимит"""
+        self._ensure_sweeper()
+        await self.close(user_id)
+
+        if len(self._sessions) >= self.max_pending:
+            self.rejected += 1
+            return None
+
+        session = LoginState(temp_client=temp_client)
+        self._sessions[user_id] = session
+        self._states[user_id] = session
+        self.started += 1
+        return session
+
+    async def finish(self, user_id):
+        """Закрыть сессию после успешного входа"""
+        if await self.close(user_id):
+            self.completed += 1
+
+    async def close(self, user_id):
+        """Отключить временный клиент и забыть сессию"""
+        session = self._sessions.pop(user_id, None)
+        if session is None:
+            return False
+        if self._states.get(user_id) is session:
+            del self._states[user_id]
+        await self._disconnect(session)
+        return True
+
+    async def _disconnect(self, session):
+        with suppress(Exception):
+            if session.temp_client.is_connected:
+                await session.temp_client.disconnect()
+
+    async def sweep(self):
+        """Закрыть просроченные и брошенные сессии"""
+        deadline = time.monotonic() - self.ttl
+        for user_id, session in list(self._sessions.items()):
+            # Пользователь ушел в другой сценарий - сессия больше не нужна
+            abandoned = self._states.get(user_id) is not session
+            if abandoned or session.touched_at < deadline:
+                if await self.close(user_id):
+                    self.expired += 1
+
+    def _ensure_sweeper(self):
+        if self._sweeper is None or self._sweeper.done():
+            self._sweeper = asyncio.get_running_loop().create_task(self._sweep_loop())
+
+    async def _sweep_loop(self):
+        while True:
+            await asyncio.sleep(self.sweep_interval)
+            await self.sweep()
+
+    async def close_all(self):
+        if self._sweeper is not None:
+            self._sweeper.cancel()
+            with suppress(asyncio.CancelledError):
+                await self._sweeper
+            self._sweeper = None
+        for user_id in list(self._sessions):
+            await self.close(user_id)
@@ -0,0 +1,302 @@
+import asyncio
+import functools
+import inspect
+import time
+from bisect import bisect_left
+from contextlib import asynccontextmanager
+
+import request_timing
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+def _labels_text(labels):
+    if not labels:
+        return ''
+    return '{' + ','.join(f'{k}="{v}"' for k, v in labels) + '}'
+
+
+class Counter:
+    """Счетчик с метками"""
+
+    kind = 'counter'
+
+    def __init__(self, name, help_text):
+        self.name = name
+        self.help = help_text
+        self.values = {}  # {tuple(labels): число}
+
+    def inc(self, amount=1, **labels):
+        key = tuple(sorted(labels.items()))
+        self.values[key] = self.values.get(key, 0) + amount
+
+    def samples(self):
+        for key, value in self.values.items():
+            yield self.name, key, value
+
+
+class Gauge:
+    """Текущее значение: задается вручную или вычисляется функцией"""
+
+    kind = 'gauge'
+
+    def __init__(self, name, help_text, func=None):
+        self.name = name
+        self.help = help_text
+        self.func = func
+        self.values = {}
+
+    def set(self, value, **labels):
+        self.values[tuple(sorted(labels.items()))] = value
+
+    def inc(self, amount=1, **labels):
+        key = tuple(sorted(labels.items()))
+        self.values[key] = self.values.get(key, 0) + amount
+
+    def dec(self, amount=1, **labels):
+        self.inc(-amount, **labels)
+
+    def samples(self):
+        if self.func is not None:
+            yield self.name, (), self.func()
+        for key, value in self.values.items():
+            yield self.name, key, value
+
+
+class Histogram:
+    """Гистограмма длительностей с метками"""
+
+    kind = 'histogram'
+
+    def __init__(self, name, help_text, buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help_text
+        self.buckets = tuple(buckets)
+        self.values = {}  # {tuple(labels): [counts по корзинам..., +Inf, sum]}
+
+    def observe(self, value, **labels):
+        key = tuple(sorted(labels.items()))
+        data = self.values.get(key)
+        if data is None:
+            data = self.values[key] = [0] * (len(self.buckets) + 1) + [0.0]
+        data[bisect_left(self.buckets, value)] += 1
+        data[-1] += value
+
+    def count(self, **labels):
+        data = self.values.get(tuple(sorted(labels.items())))
+        return sum(data[:-1]) if data else 0
+
+    def quantile(self, q, **labels):
+        """Оценка квантиля по корзинам (верхняя граница корзины)"""
+        data = self.values.get(tuple(sorted(labels.items())))
+        if not data:
+            return None
+        total = sum(data[:-1])
+        rank = q * total
+        seen = 0
+        for bound, count in zip(self.buckets + (float('inf'),), data[:-1]):
+            seen += count
+            if seen >= rank:
+                return bound
+        return float('inf')
+
+    def samples(self):
+        for key, data in self.values.items():
+            seen = 0
+            for bound, count in zip(self.buckets, data):
+                seen += count
+                yield f'{self.name}_bucket', key + (('le', repr(bound)),), seen
+            yield f'{self.name}_bucket', key + (('le', '+Inf'),), sum(data[:-1])
+            yield f'{self.name}_sum', key, data[-1]
+            yield f'{self.name}_count', key, sum(data[:-1])
+
+
+class Registry:
+    def __init__(self):
+        self.metrics = {}
+
+    def register(self, metric):
+        self.metrics[metric.name] = metric
+        return metric
+
+    def render(self):
+        """Все метрики в текстовом формате Prometheus"""
+        lines = []
+        for metric in self.metrics.values():
+            lines.append(f'# HELP {metric.name} {metric.help}')
+            lines.append(f'# TYPE {metric.name} {metric.kind}')
+            for name, labels, value in metric.samples():
+                lines.append(f'{name}{_labels_text(labels)} {value}')
+        return '\n'.join(lines) + '\n'
+
+
+registry = Registry()
+
+handler_latency = registry.register(Histogram(
+    'bot_handler_duration_seconds', 'Длительность обработчиков бота'
+))
+handler_in_flight = registry.register(Gauge(
+    'bot_handler_in_flight', 'Обработчики, выполняющиеся сейчас'
+))
+mtproto_latency = registry.register(Histogram(
+    'bot_mtproto_call_duration_seconds', 'Длительность вызовов MTProto клиентов аккаунтов'
+))
+mtproto_calls = registry.register(Counter(
+    'bot_mtproto_calls_total', 'Вызовы MTProto клиентов аккаунтов'
+))
+mtproto_in_flight = registry.register(Gauge(
+    'bot_mtproto_in_flight', 'Вызовы MTProto, выполняющиеся сейчас'
+))
+errors = registry.register(Counter(
+    'bot_errors_total', 'Ошибки по месту и типу исключения'
+))
+
+
+def gauge(name, help_text, func):
+    """Зарегистрировать вычисляемый показатель (размер пула и т.п.)"""
+    return registry.register(Gauge(name, help_text, func))
+
+
+def record_error(where, exc):
+    errors.inc(where=where, type=type(exc).__name__)
+
+
+def timed(handler_name):
+    """Декоратор обработчика: длительность, число выполняющихся, ошибки"""
+    def decorator(func):
+        @functools.wraps(func)
+        async def wrapper(*args, **kwargs):
+            handler_in_flight.inc(handler=handler_name)
+            started = time.perf_counter()
+            try:
+                return await func(*args, **kwargs)
+            except Exception as e:
+                record_error(handler_name, e)
+                raise
+            finally:
+                handler_latency.observe(time.perf_counter() - started, handler=handler_name)
+                handler_in_flight.dec(handler=handler_name)
+        return wrapper
+    return decorator
+
+
+@asynccontextmanager
+async def track_mtproto(method):
+    """Учесть один вызов MTProto"""
+    mtproto_calls.inc(method=method)
+    mtproto_in_flight.inc(method=method)
+    started = time.perf_counter()
+    try:
+        yield
+    except Exception as e:
+        record_error(f'mtproto.{method}', e)
+        raise
+    finally:
+        elapsed = time.perf_counter() - started
+        mtproto_latency.observe(elapsed, method=method)
+        mtproto_in_flight.dec(method=method)
+        request_timing.add(MTPROTO_PHASES.get(method, method), elapsed)
+
+
+# Методы клиента аккаунта, вызовы которых учитываются
+MTPROTO_METHODS = (
+    'connect', 'disconnect', 'get_me', 'get_dialogs', 'get_chat_history',
+    'create_channel', 'create_chat_invite_link',
+)
+
+# Этапы журнала медленных запросов для вызовов MTProto
+MTPROTO_PHASES = {
+    'get_dialogs': 'dialogs',
+    'get_chat_history': 'history',
+    'create_channel': 'channel',
+    'create_chat_invite_link': 'channel',
+}
+
+
+def instrument_client(client, methods=MTPROTO_METHODS):
+    """Обернуть методы клиента учетом вызовов (на уровне экземпляра)"""
+    for method in methods:
+        setattr(client, method, _wrap_method(method, getattr(client, method)))
+    return client
+
+
+def _wrap_method(method, original):
+    # Методы pyrogram возвращают корутину или асинхронный генератор
+    # (get_dialogs, get_chat_history) - генератор учитываем до конца перебора
+    @functools.wraps(original)
+    def wrapper(*args, **kwargs):
+        result = original(*args, **kwargs)
+        if inspect.isasyncgen(result):
+            return _track_generator(method, result)
+        return _track_coroutine(method, result)
+    return wrapper
+
+
+async def _track_coroutine(method, coroutine):
+    async with track_mtproto(method):
+        return await coroutine
+
+
+async def _track_generator(method, agen):
+    async with track_mtproto(method):
+        async for item in agen:
+            yield item
+
+
+async def start_server(host='127.0.0.1', port=9108):
+    """HTTP сервер для Prometheus: на любой запрос отдает текущие метрики"""
+    async def handle(reader, writer):
+        try:
+            await reader.readuntil(b'\r\n\r\n')
+            body = registry.render().encode()
+            writer.write(
+                b'HTTP/1.1 200 OK\r\n'
+                b'Content-Type: text/plain; version=0.0.4; charset=utf-8\r\n'
+                + f'Content-Length: {len(body)}\r\n'.encode()
+                + b'Connection: close\r\n\r\n'
+                + body
+            )
+            await writer.drain()
+        except (asyncio.IncompleteReadError, asyncio.LimitOverrunError, ConnectionError):
+            pass
+        finally:
+            writer.close()
+
+    return await asyncio.start_server(handle, host, port)
+
+
+def format_stats(extra=None):
+    """Краткая сводка для команды /stats"""
+    lines = ["📊 **Статистика**", ""]
+
+    lines.append("**Обработчики** (вызовов, p50, p95):")
+    for key in sorted(handler_latency.values):
+        labels = dict(key)
+        count = handler_latency.count(**labels)
+        p50 = handler_latency.quantile(0.5, **labels)
+        p95 = handler_latency.quantile(0.95, **labels)
+        lines.append(f"`{labels['handler']}`: {count}, ≤{p50}с, ≤{p95}с")
+
+    lines.append("")
+    lines.append("**MTProto** (вызовов, p95):")
+    for key, count in sorted(mtproto_calls.values.items()):
+        labels = dict(key)
+        lines.append(f"`{labels['method']}`: {count}, ≤{mtproto_latency.quantile(0.95, **labels)}с")
+
+    in_flight = sum(handler_in_flight.values.values())
+    lines.append("")
+    lines.append(f"**Выполняется сейчас:** {in_flight}")
+
+    if errors.values:
+        lines.append("")
+        lines.append("**Ошибки:**")
+        for key, count in sorted(errors.values.items()):
+            labels = dict(key)
+            lines.append(f"`{labels['where']}` {labels['type']}: {count}")
+
+    if extra:
+        lines.append("")
+        for title, value in extra.items():
+            lines.append(f"**{title}:** {value}")
+
+    return '\n'.join(lines)
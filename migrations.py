@@ -0,0 +1,104 @@
+import sqlite3
+
+# Версия схемы хранится в PRAGMA user_version. Миграции применяются по
+# порядку, каждая в своей транзакции вместе с новым номером версии.
+# Уже выпущенные миграции не меняем - только добавляем новые в конец.
+MIGRATIONS = [
+    # 1: исходная таблица (в старых базах уже есть, версия 0)
+    (1, [
+        '''CREATE TABLE IF NOT EXISTS accounts
+           (id INTEGER PRIMARY KEY AUTOINCREMENT,
+            phone TEXT UNIQUE,
+            session_string TEXT,
+            status TEXT DEFAULT 'active',
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP)''',
+    ]),
+    # 2: выборки активных аккаунтов и постраничный список по id без сканирования таблицы
+    (2, [
+        "CREATE INDEX IF NOT EXISTS idx_accounts_status_id ON accounts (status, id)",
+    ]),
+    # 3: использование и здоровье аккаунта
+    (3, [
+        "ALTER TABLE accounts ADD COLUMN last_used_at TIMESTAMP",
+        "ALTER TABLE accounts ADD COLUMN last_error TEXT",
+        "ALTER TABLE accounts ADD COLUMN last_checked_at TIMESTAMP",
+        "ALTER TABLE accounts ADD COLUMN error_count INTEGER NOT NULL DEFAULT 0",
+    ]),
+    # 4: курсоры истории чатов для поиска кода только в новых сообщениях
+    (4, [
+        '''CREATE TABLE IF NOT EXISTS history_cursors
+           (phone TEXT NOT NULL,
+            chat_id INTEGER NOT NULL,
+            last_message_id INTEGER NOT NULL,
+            code TEXT,
+            span_start INTEGER,
+            span_end INTEGER,
+            score REAL,
+            text TEXT,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            PRIMARY KEY (phone, chat_id)) WITHOUT ROWID''',
+    ]),
+    # 5: кэш пиров и верхних диалогов аккаунтов
+    (5, [
+        '''CREATE TABLE IF NOT EXISTS account_peers
+           (phone TEXT NOT NULL,
+            peer_id INTEGER NOT NULL,
+            access_hash INTEGER,
+            type TEXT NOT NULL,
+            username TEXT,
+            phone_number TEXT,
+            updated_at INTEGER NOT NULL,
+            PRIMARY KEY (phone, peer_id)) WITHOUT ROWID''',
+        "CREATE INDEX IF NOT EXISTS idx_account_peers_updated ON account_peers (updated_at)",
+        '''CREATE TABLE IF NOT EXISTS account_dialogs
+           (phone TEXT NOT NULL,
+            position INTEGER NOT NULL,
+            chat_id INTEGER NOT NULL,
+            type TEXT NOT NULL,
+            title TEXT,
+            first_name TEXT,
+            last_name TEXT,
+            username TEXT,
+            is_verified INTEGER NOT NULL DEFAULT 0,
+            is_support INTEGER NOT NULL DEFAULT 0,
+            unread INTEGER NOT NULL DEFAULT 0,
+            cached_at REAL NOT NULL,
+            PRIMARY KEY (phone, position)) WITHOUT ROWID''',
+    ]),
+]
+
+LATEST_VERSION = MIGRATIONS[-1][0]
+
+
+class MigrationError(Exception):
+    """Схема базы новее, чем знает этот код, или миграция не применилась"""
+
+
+def schema_version(conn):
+    return conn.execute("PRAGMA user_version").fetchone()[0]
+
+
+def migrate(conn):
+    """Применить недостающие миграции, вернуть список примененных версий"""
+    current = schema_version(conn)
+    if current > LATEST_VERSION:
+        raise MigrationError(
+            f"версия схемы базы {current} новее поддерживаемой {LATEST_VERSION}"
+        )
+
+    applied = []
+    for version, statements in MIGRATIONS:
+        if version <= current:
+            continue
+        # DDL в sqlite3 не открывает транзакцию сам - открываем явно
+        conn.execute("BEGIN")
+        try:
+            for sql in statements:
+                conn.execute(sql)
+            conn.execute(f"PRAGMA user_version = {int(version)}")
+        except sqlite3.Error as e:
+            conn.execute("ROLLBACK")
+            raise MigrationError(f"миграция {version} не применилась: {e}") from e
+        conn.execute("COMMIT")
+        applied.append(version)
+    return applied
@@ -0,0 +1,110 @@
+import time
+from typing import NamedTuple, Optional
+
+from pyrogram.enums import ChatType
+
+
+class CachedChat(NamedTuple):
+    """Чат из кэша диалогов: поля, которые нужны get_chat_name и dialog_priority"""
+    id: int
+    type: ChatType
+    title: Optional[str]
+    first_name: Optional[str]
+    last_name: Optional[str]
+    username: Optional[str]
+    is_verified: bool
+    is_support: bool
+
+
+class CachedDialog(NamedTuple):
+    """Диалог из кэша. top_message неизвестен, поэтому курсоры истории
+    не позволяют пропустить загрузку - только остановиться на курсоре"""
+    chat: CachedChat
+    unread_messages_count: int
+    top_message: None = None
+
+
+class PeerCache:
+    """Кэш пиров и диалогов аккаунтов в accounts.db.
+
+    Пиры (id, access_hash, ...) из памяти клиента сохраняются перед
+    отключением и загружаются в клиент сразу после подключения, так что
+    после переподключения не нужно заново получать их через get_dialogs.
+    На аккаунт хранится не больше ``max_per_account`` самых свежих пиров,
+    всего - не больше ``max_total``.
+
+    Если ``dialogs_ttl`` > 0, список диалогов сохраняется при загрузке и
+    отдается из кэша, пока не устарел (GetDialogs Telegram ограничивает
+    строже остальных запросов).
+    """
+
+    def __init__(self, storage, max_per_account=1000, max_total=200000, dialogs_ttl=0):
+        self._storage = storage
+        self.max_per_account = max_per_account
+        self.max_total = max_total
+        self.dialogs_ttl = dialogs_ttl
+        self.loaded = 0  # пиров загружено в клиенты
+        self.saved = 0
+        self.dialog_hits = 0
+        self.dialog_misses = 0
+
+    async def load(self, phone, client):
+        """Загрузить сохраненные пиры в только что подключенный клиент"""
+        try:
+            peers = await self._storage.get_peers(phone)
+            if peers:
+                await client.storage.update_peers([peer[:5] for peer in peers])
+                # update_peers помечает пиры текущим временем - возвращаем прежнее,
+                # иначе save() и лимиты в базе сочтут неиспользуемые пиры свежими
+                client.storage.conn.executemany(
+                    "UPDATE peers SET last_update_on = ? WHERE id = ?",
+                    [(peer[5], peer[0]) for peer in peers]
+                )
+                self.loaded += len(peers)
+        except Exception as e:
+            # Кэш - только ускорение: без него клиент получит пиры сам
+            print(f"⚠️ Кэш пиров {phone}: {e!r}")
+
+    async def save(self, phone, client):
+        """Сохранить пиры клиента перед отключением"""
+        # MemoryStorage pyrogram - SQLite в памяти с таблицей peers
+        peers = client.storage.conn.execute(
+            "SELECT id, access_hash, type, username, phone_number, last_update_on FROM peers"
+            " ORDER BY last_update_on DESC LIMIT ?",
+            (self.max_per_account,)
+        ).fetchall()
+        if peers:
+            await self._storage.save_peers(phone, peers, self.max_per_account, self.max_total)
+            self.saved += len(peers)
+
+    async def get_dialogs(self, phone, client, limit):
+        """Верхние диалоги аккаунта: из кэша, если он свежий, иначе с сервера"""
+        if self.dialogs_ttl > 0:
+            rows = await self._storage.get_dialogs(phone, time.time() - self.dialogs_ttl)
+            if rows:
+                self.dialog_hits += 1
+                return [_dialog_from_row(row) for row in rows[:limit]]
+
+        self.dialog_misses += 1
+        dialogs = []
+        async for dialog in client.get_dialogs(limit=limit):
+            dialogs.append(dialog)
+        if self.dialogs_ttl > 0:
+            await self._storage.save_dialogs(phone, [_dialog_to_row(d) for d in dialogs])
+        return dialogs
+
+
+def _dialog_to_row(dialog):
+    chat = dialog.chat
+    return (
+        chat.id, chat.type.value, chat.title, chat.first_name, chat.last_name, chat.username,
+        bool(chat.is_verified), bool(chat.is_support), dialog.unread_messages_count or 0,
+    )
+
+
+def _dialog_from_row(row):
+    chat_id, chat_type, title, first_name, last_name, username, verified, support, unread = row
+    chat = CachedChat(
+        chat_id, ChatType(chat_type), title, first_name, last_name, username, bool(verified), bool(support)
+    )
+    return CachedDialog(chat, unread)
@@ -0,0 +1,83 @@
+import asyncio
+import os
+import sys
+import threading
+import time
+from collections import Counter
+
+
+class ProfilerBusy(Exception):
+    """Профилирование уже идет"""
+
+
+class SamplingProfiler:
+    """Выборочный профилировщик всего процесса.
+
+    Отдельный поток раз в ``interval`` секунд снимает стеки всех потоков
+    (sys._current_frames) и считает одинаковые. Результат - файл в
+    формате folded stacks ("поток;файл:функция;... число"), который
+    понимают flamegraph.pl и speedscope.
+    """
+
+    def __init__(self, interval=0.01, directory='profiles'):
+        self.interval = interval
+        self.directory = directory
+        self._stacks = Counter()
+        self._stop = threading.Event()
+        self._thread = None
+        self.samples = 0
+
+    @property
+    def running(self):
+        return self._thread is not None
+
+    def start(self):
+        if self.running:
+            raise ProfilerBusy("профилирование уже идет")
+        self._stacks = Counter()
+        self.samples = 0
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name='profiler', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """Остановить и записать файл, вернуть его путь"""
+        self._stop.set()
+        self._thread.join()
+        self._thread = None
+
+        os.makedirs(self.directory, exist_ok=True)
+        path = os.path.join(self.directory, time.strftime('profile-%Y%m%d-%H%M%S.folded'))
+        with open(path, 'w', encoding='utf-8') as f:
+            for stack, count in self._stacks.most_common():
+                f.write(f"{stack} {count}\n")
+        return path
+
+    async def run(self, seconds):
+        """Профилировать seconds секунд, не блокируя цикл событий; вернуть путь к файлу"""
+        self.start()
+        return await self.stop_after(seconds)
+
+    async def stop_after(self, seconds):
+        """Остановить уже запущенное профилирование через seconds секунд"""
+        try:
+            await asyncio.sleep(seconds)
+        finally:
+            path = await asyncio.get_running_loop().run_in_executor(None, self.stop)
+        return path
+
+    def _run(self):
+        own = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            names = {thread.ident: thread.name for thread in threading.enumerate()}
+            for ident, frame in sys._current_frames().items():
+                if ident == own:
+                    continue
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append(f"{os.path.basename(code.co_filename)}:{code.co_name}")
+                    frame = frame.f_back
+                stack.append(names.get(ident, str(ident)))
+                self._stacks[';'.join(reversed(stack))] += 1
+            self.samples += 1
@@ -0,0 +1,90 @@
+import contextvars
+import functools
+import inspect
+import json
+import time
+from contextlib import contextmanager
+
+_current = contextvars.ContextVar('request_timer', default=None)
+
+
+class RequestTimer:
+    """Время одного запроса по этапам (БД, подключение, диалоги, история...).
+
+    Задачи, созданные внутри запроса, пишут в тот же таймер, поэтому
+    у параллельных этапов (истории чатов) время суммируется.
+    """
+
+    __slots__ = ('phases', 'counts')
+
+    def __init__(self):
+        self.phases = {}  # {этап: секунды}
+        self.counts = {}  # {этап: число вызовов}
+
+    def add(self, phase, seconds):
+        self.phases[phase] = self.phases.get(phase, 0.0) + seconds
+        self.counts[phase] = self.counts.get(phase, 0) + 1
+
+
+def add(phase, seconds):
+    """Учесть время этапа в текущем запросе (вне запроса ничего не делает)"""
+    timer = _current.get()
+    if timer is not None:
+        timer.add(phase, seconds)
+
+
+@contextmanager
+def phase(name):
+    """Замерить блок как этап текущего запроса"""
+    timer = _current.get()
+    if timer is None:
+        yield
+        return
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        timer.add(name, time.perf_counter() - started)
+
+
+class SlowRequestLog:
+    """Журнал медленных запросов: JSON-строка на каждый запрос дольше ``threshold`` секунд"""
+
+    def __init__(self, path='slow_requests.log', threshold=3.0):
+        self.path = path
+        self.threshold = threshold
+        self.recorded = 0
+
+    def track(self, name):
+        """Декоратор обработчика: замеряет этапы и пишет запрос в журнал, если он медленный"""
+        def decorator(func):
+            signature = inspect.signature(func)
+
+            @functools.wraps(func)
+            async def wrapper(*args, **kwargs):
+                timer = RequestTimer()
+                token = _current.set(timer)
+                started = time.perf_counter()
+                try:
+                    return await func(*args, **kwargs)
+                finally:
+                    _current.reset(token)
+                    total = time.perf_counter() - started
+                    if self.threshold and total >= self.threshold:
+                        phone = signature.bind_partial(*args, **kwargs).arguments.get('phone')
+                        self.record(name, phone, total, timer)
+            return wrapper
+        return decorator
+
+    def record(self, name, phone, total, timer):
+        entry = {
+            'time': time.strftime('%Y-%m-%d %H:%M:%S'),
+            'handler': name,
+            'phone': phone,
+            'total_ms': round(total * 1000, 1),
+            'phases_ms': {k: round(v * 1000, 1) for k, v in sorted(timer.phases.items())},
+            'calls': dict(sorted(timer.counts.items())),
+        }
+        with open(self.path, 'a', encoding='utf-8') as f:
+            f.write(json.dumps(entry, ensure_ascii=False) + '\n')
+        self.recorded += 1
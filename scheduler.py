@@ -0,0 +1,177 @@
+import asyncio
+import functools
+import inspect
+import time
+
+from pyrogram.errors import FloodWait
+
+import request_timing
+
+# Вызовы API аккаунта, которые проходят через планировщик
+SCHEDULED_METHODS = (
+    'get_me', 'get_dialogs', 'get_chat_history', 'create_channel', 'create_chat_invite_link',
+)
+
+
+class _Bucket:
+    """Корзина токенов одного аккаунта"""
+
+    __slots__ = ('tokens', 'updated', 'blocked_until')
+
+    def __init__(self, burst):
+        self.tokens = float(burst)
+        self.updated = time.monotonic()
+        self.blocked_until = 0.0  # до этого момента аккаунт под FloodWait
+
+
+class AccountScheduler:
+    """Очередь вызовов API аккаунтов.
+
+    Каждый аккаунт ограничен корзиной токенов (``rate`` вызовов в секунду,
+    всплеск до ``burst``), а одновременно по всем аккаунтам выполняется не
+    больше ``max_concurrency`` вызовов. На FloodWait аккаунт замораживается
+    на указанное сервером время и вызов повторяется; ожидания длиннее
+    ``max_flood_wait`` секунд возвращаются вызывающему как FloodWait.
+    """
+
+    def __init__(self, rate=3.0, burst=15, max_concurrency=16, max_flood_wait=60, max_retries=3):
+        self._buckets = {}  # {phone: _Bucket}
+        self._slots = asyncio.Semaphore(max_concurrency)
+        self.rate = rate
+        self.burst = burst
+        self.max_concurrency = max_concurrency
+        self.max_flood_wait = max_flood_wait
+        self.max_retries = max_retries
+        self.waiting = 0  # вызовы в очереди (ждут токен или слот)
+        self.running = 0
+        self.flood_waits = 0
+        self.flood_wait_seconds = 0
+
+    def wrap(self, client, phone, methods=SCHEDULED_METHODS):
+        """Пустить вызовы клиента аккаунта через планировщик (на уровне экземпляра)"""
+        for method in methods:
+            setattr(client, method, self._wrap_method(phone, getattr(client, method)))
+        return client
+
+    def _wrap_method(self, phone, original):
+        # Как и в metrics.instrument_client: результат - корутина или
+        # асинхронный генератор (get_dialogs, get_chat_history)
+        @functools.wraps(original)
+        def wrapper(*args, **kwargs):
+            call = functools.partial(original, *args, **kwargs)
+            result = call()
+            if inspect.isasyncgen(result):
+                return self._run_generator(phone, call, result)
+            return self._run_coroutine(phone, call, result)
+        return wrapper
+
+    async def _run_coroutine(self, phone, call, coroutine):
+        for attempt in range(self.max_retries + 1):
+            if attempt:
+                coroutine = call()
+            await self._wait_turn(phone)
+            try:
+                async with self._slot():
+                    return await coroutine
+            except FloodWait as e:
+                self._on_flood_wait(phone, e, attempt)
+            finally:
+                coroutine.close()  # не ожидавшаяся корутина не оставляет предупреждений
+
+    async def _run_generator(self, phone, call, agen):
+        # Запрос к серверу выполняется при получении первого элемента,
+        # дальше элементы идут из уже полученной страницы. Повторяем только
+        # до первого элемента, чтобы не отдать сообщения дважды.
+        for attempt in range(self.max_retries + 1):
+            if attempt:
+                agen = call()
+            await self._wait_turn(phone)
+            try:
+                async with self._slot():
+                    first = await agen.__anext__()
+            except StopAsyncIteration:
+                return
+            except FloodWait as e:
+                await agen.aclose()
+                self._on_flood_wait(phone, e, attempt)
+                continue
+            break
+
+        try:
+            yield first
+            async for item in agen:
+                yield item
+        finally:
+            await agen.aclose()
+
+    def _on_flood_wait(self, phone, error, attempt):
+        """Заморозить аккаунт на время FloodWait или пробросить ошибку"""
+        self.flood_waits += 1
+        if error.value > self.max_flood_wait or attempt >= self.max_retries:
+            raise error
+        self.flood_wait_seconds += error.value
+        bucket = self._bucket(phone)
+        bucket.blocked_until = max(bucket.blocked_until, time.monotonic() + error.value)
+
+    def _bucket(self, phone):
+        bucket = self._buckets.get(phone)
+        if bucket is None:
+            bucket = self._buckets[phone] = _Bucket(self.burst)
+        return bucket
+
+    async def _wait_turn(self, phone):
+        """Дождаться токена аккаунта (и конца его FloodWait)"""
+        bucket = self._bucket(phone)
+        now = time.monotonic()
+        bucket.tokens = min(self.burst, bucket.tokens + (now - bucket.updated) * self.rate)
+        bucket.updated = now
+        # Токен резервируется сразу: при нехватке баланс уходит в минус,
+        # и каждый следующий вызов ждет на 1/rate дольше предыдущего
+        bucket.tokens -= 1
+        delay = max(bucket.blocked_until - now, -bucket.tokens / self.rate)
+        if delay > 0:
+            self.waiting += 1
+            try:
+                with request_timing.phase('queue'):
+                    await asyncio.sleep(delay)
+            finally:
+                self.waiting -= 1
+
+    def _slot(self):
+        return _Slot(self)
+
+    def stats(self):
+        now = time.monotonic()
+        return {
+            'waiting': self.waiting,
+            'running': self.running,
+            'blocked_accounts': sum(1 for b in self._buckets.values() if b.blocked_until > now),
+            'flood_waits': self.flood_waits,
+            'flood_wait_seconds': self.flood_wait_seconds,
+        }
+
+
+class _Slot:
+    """Место среди max_concurrency одновременных вызовов"""
+
+    __slots__ = ('_scheduler',)
+
+    def __init__(self, scheduler):
+        self._scheduler = scheduler
+
+    async def __aenter__(self):
+        scheduler = self._scheduler
+        if scheduler._slots.locked():
+            scheduler.waiting += 1
+            try:
+                with request_timing.phase('queue'):
+                    await scheduler._slots.acquire()
+            finally:
+                scheduler.waiting -= 1
+        else:
+            await scheduler._slots.acquire()
+        scheduler.running += 1
+
+    async def __aexit__(self, *exc_info):
+        self._scheduler.running -= 1
+        self._scheduler._slots.release()
@@ -0,0 +1,67 @@
+import asyncio
+import time
+
+
+class SingleFlight:
+    """Объединение одинаковых одновременных запросов.
+
+    Пока выполняется запрос с ключом key, остальные вызовы run(key, ...)
+    ждут его же результат. Успешный результат еще ``ttl`` секунд отдается
+    из кэша без повторного запроса.
+    """
+
+    def __init__(self, ttl=5, max_cached=1000):
+        self._in_flight = {}  # {key: Task}
+        self._cache = {}  # {key: (истекает, результат)}
+        self.ttl = ttl
+        self.max_cached = max_cached
+        self.calls = 0
+        self.coalesced = 0
+        self.cache_hits = 0
+
+    def __len__(self):
+        return len(self._in_flight)
+
+    async def run(self, key, factory):
+        """Результат factory() для key: из кэша, общего запроса или нового"""
+        self.calls += 1
+        cached = self._cache.get(key)
+        if cached is not None:
+            if cached[0] > time.monotonic():
+                self.cache_hits += 1
+                return cached[1]
+            del self._cache[key]
+
+        task = self._in_flight.get(key)
+        if task is None:
+            # Отдельная задача: отмена одного из ждущих не отменяет запрос для остальных
+            task = asyncio.get_running_loop().create_task(self._run(key, factory))
+            # Ошибку забираем сразу, даже если все ждущие уже отменены
+            task.add_done_callback(lambda t: t.cancelled() or t.exception())
+            self._in_flight[key] = task
+        else:
+            self.coalesced += 1
+        return await asyncio.shield(task)
+
+    async def _run(self, key, factory):
+        try:
+            result = await factory()
+        finally:
+            del self._in_flight[key]
+        if self.ttl > 0:
+            self._store(key, result)
+        return result
+
+    def _store(self, key, result):
+        now = time.monotonic()
+        if len(self._cache) >= self.max_cached:
+            for stale in [k for k, (expires, _) in self._cache.items() if expires <= now]:
+                del self._cache[stale]
+            if len(self._cache) >= self.max_cached:
+                # Все свежие - выбрасываем самую старую запись
+                del self._cache[next(iter(self._cache))]
+        self._cache[key] = (now + self.ttl, result)
+
+    def forget(self, key):
+        """Сбросить закэшированный результат"""
+        self._cache.pop(key, None)
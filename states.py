@@ -0,0 +1,57 @@
+import time
+from dataclasses import dataclass, field
+from enum import Enum
+
+
+class State(Enum):
+    """Шаги диалога с пользователем"""
+    WAITING_PHONE = 'waiting_phone'
+    WAITING_CODE = 'waiting_code'
+    WAITING_PASSWORD = 'waiting_password'
+    CREATING_CHANNEL_TITLE = 'creating_channel_title'
+    CREATING_CHANNEL_DESCRIPTION = 'creating_channel_description'
+
+
+# Разрешенные переходы внутри одного объекта состояния.
+# Смена сценария (например, новая команда) заменяет объект целиком.
+TRANSITIONS = {
+    State.WAITING_PHONE: {State.WAITING_CODE},
+    State.WAITING_CODE: {State.WAITING_PASSWORD},
+    State.WAITING_PASSWORD: set(),
+    State.CREATING_CHANNEL_TITLE: {State.CREATING_CHANNEL_DESCRIPTION},
+    State.CREATING_CHANNEL_DESCRIPTION: set(),
+}
+
+
+class InvalidTransition(Exception):
+    pass
+
+
+def transition(data, new_state):
+    """Перевести состояние пользователя на следующий шаг"""
+    if new_state not in TRANSITIONS[data.state]:
+        raise InvalidTransition(f"{data.state.value} -> {new_state.value}")
+    data.state = new_state
+    return data
+
+
+@dataclass(slots=True)
+class LoginState:
+    """Добавление аккаунта: телефон -> код -> пароль 2FA"""
+    temp_client: object
+    state: State = State.WAITING_PHONE
+    phone: str = None
+    phone_code_hash: str = None
+    touched_at: float = field(default_factory=time.monotonic)
+
+    def touch(self):
+        """Отметить активность пользователя (для удаления брошенных сессий)"""
+        self.touched_at = time.monotonic()
+
+
+@dataclass(slots=True)
+class ChannelDraft:
+    """Создание канала: название -> описание"""
+    phone: str
+    state: State = State.CREATING_CHANNEL_TITLE
+    title: str = None
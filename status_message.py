@@ -0,0 +1,122 @@
+import asyncio
+import time
+from contextlib import suppress
+
+from pyrogram.errors import FloodWait, MessageNotModified
+
+import metrics
+import request_timing
+
+status_edits = metrics.registry.register(metrics.Counter(
+    'bot_status_messages_total', 'Сообщения о ходе операций: отправлены, изменены, объединены'
+))
+
+
+class StatusMessage:
+    """Одно сообщение о ходе операции, которое меняется на месте.
+
+    start() отправляет сообщение через ``show_after`` секунд, если
+    операция к тому времени не закончилась (быстрая команда получает
+    сразу итог одним ответом). update() меняет текст не чаще раза в
+    ``min_interval`` секунд - промежуточные тексты объединяются, уходит
+    последний. finish() записывает итог в то же сообщение, а если
+    изменить его не удалось - отправляет итог отдельным ответом.
+    """
+
+    def __init__(self, message, min_interval=1.0, show_after=0.5):
+        self._message = message  # сообщение, на которое отвечаем
+        self._sent = None
+        self._text = None  # текст, который сейчас показан (или будет отправлен)
+        self._pending = None  # последний еще не показанный текст
+        self._send = None
+        self._sending = False
+        self._flush = None
+        self._edited_at = 0.0
+        self.min_interval = min_interval
+        self.show_after = show_after
+
+    async def start(self, text):
+        self._text = text
+        if self.show_after <= 0:
+            await self._send_now()
+        else:
+            self._send = asyncio.get_running_loop().create_task(self._send_later())
+
+    async def _send_later(self):
+        await asyncio.sleep(self.show_after)
+        await self._send_now()
+
+    async def _send_now(self):
+        self._sending = True
+        with request_timing.phase('reply'):
+            self._sent = await self._message.reply_text(self._text)
+        self._edited_at = time.monotonic()
+        status_edits.inc(kind='sent')
+
+    def update(self, text):
+        """Показать промежуточный текст (не ждет отправки)"""
+        if self._sent is None:
+            if not self._sending:
+                self._text = text  # еще не отправлено - уйдет сразу новый текст
+            return
+        if text == self._text:
+            return
+        if self._pending is not None:
+            status_edits.inc(kind='coalesced')
+        self._pending = text
+        if self._flush is None or self._flush.done():
+            self._flush = asyncio.get_running_loop().create_task(self._flush_later())
+
+    async def _flush_later(self):
+        delay = self._edited_at + self.min_interval - time.monotonic()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        text, self._pending = self._pending, None
+        if text is None:
+            return
+        try:
+            await self._edit(text)
+        except Exception:
+            pass  # промежуточный текст можно пропустить, итог покажет finish()
+
+    async def finish(self, text, **kwargs):
+        """Показать итог: изменить сообщение или, если его еще нет, ответить"""
+        if self._send is not None and not self._send.done() and not self._sending:
+            self._send.cancel()
+        if self._send is not None:
+            with suppress(Exception, asyncio.CancelledError):
+                await self._send
+        if self._flush is not None:
+            self._flush.cancel()
+            with suppress(Exception, asyncio.CancelledError):
+                await self._flush
+        if self._pending is not None:
+            status_edits.inc(kind='coalesced')
+            self._pending = None
+
+        if self._sent is not None:
+            try:
+                try:
+                    await self._edit(text, **kwargs)
+                except FloodWait as e:
+                    # Итог важнее лимита: ждем и повторяем один раз
+                    await asyncio.sleep(e.value)
+                    await self._edit(text, **kwargs)
+                return
+            except Exception as e:
+                # Сообщение удалено или не меняется - итог уходит отдельным ответом
+                print(f"⚠️ Не удалось изменить сообщение о ходе операции: {e!r}")
+
+        with request_timing.phase('reply'):
+            await self._message.reply_text(text, **kwargs)
+        status_edits.inc(kind='sent')
+
+    async def _edit(self, text, **kwargs):
+        self._edited_at = time.monotonic()
+        try:
+            with request_timing.phase('reply'):
+                await self._sent.edit_text(text, **kwargs)
+        except MessageNotModified:
+            return
+        self._text = text
+        status_edits.inc(kind='edited')
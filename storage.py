@@ -0,0 +1,306 @@
+import asyncio
+import sqlite3
+import time
+from datetime import datetime, timezone
+from concurrent.futures import ThreadPoolExecutor
+
+import request_timing
+from account_index import AccountIndex, AccountRecord
+from migrations import migrate
+
+ACCOUNT_COLUMNS = (
+    "id, phone, session_string, status, created_at,"
+    " last_used_at, last_error, last_checked_at, error_count"
+)
+
+
+class Storage:
+    """Хранилище аккаунтов поверх одного долгоживущего соединения SQLite.
+
+    Все запросы выполняются в отдельном потоке, поэтому обработчики бота
+    ждут их через ``await`` и не блокируют цикл событий. База работает в
+    режиме WAL, подготовленные выражения кэшируются соединением.
+
+    Аккаунты дополнительно держатся в ``index`` (AccountIndex): чтения
+    обслуживаются из памяти, записи проходят в базу и сразу в индекс.
+    """
+
+    def __init__(self, path='accounts.db', busy_timeout=5000, cached_statements=128):
+        self.path = path
+        self.busy_timeout = busy_timeout  # миллисекунды
+        self.cached_statements = cached_statements
+        # Один поток: соединение SQLite используется только из него
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='storage')
+        self._conn = None
+        self.index = AccountIndex()
+        self.migrations_applied = []
+
+    async def _run(self, func, *args):
+        loop = asyncio.get_running_loop()
+        with request_timing.phase('db'):
+            return await loop.run_in_executor(self._executor, func, *args)
+
+    def _connection(self):
+        if self._conn is None:
+            conn = sqlite3.connect(
+                self.path,
+                check_same_thread=False,
+                cached_statements=self.cached_statements
+            )
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute(f"PRAGMA busy_timeout={int(self.busy_timeout)}")
+            self._conn = conn
+        return self._conn
+
+    def _execute(self, sql, params=()):
+        conn = self._connection()
+        with conn:
+            return conn.execute(sql, params).rowcount
+
+    def _fetchone(self, sql, params=()):
+        return self._connection().execute(sql, params).fetchone()
+
+    def _fetchall(self, sql, params=()):
+        return self._connection().execute(sql, params).fetchall()
+
+    async def execute(self, sql, params=()):
+        """Выполнить запрос на запись в транзакции, вернуть число строк"""
+        return await self._run(self._execute, sql, params)
+
+    async def fetchone(self, sql, params=()):
+        return await self._run(self._fetchone, sql, params)
+
+    async def fetchall(self, sql, params=()):
+        return await self._run(self._fetchall, sql, params)
+
+    async def init_db(self):
+        """Применить миграции схемы и загрузить индекс аккаунтов"""
+        self.migrations_applied = await self._run(lambda: migrate(self._connection()))
+        await self.load_index()
+
+    async def load_index(self):
+        """Загрузить все аккаунты в индекс"""
+        rows = await self.fetchall(f"SELECT {ACCOUNT_COLUMNS} FROM accounts")
+        self.index.load(rows)
+
+    async def get_account(self, phone):
+        """Запись аккаунта (из индекса, до его загрузки - из базы) или None"""
+        if self.index.loaded:
+            self.index.hits += 1
+            return self.index.get(phone)
+
+        self.index.misses += 1
+        row = await self.fetchone(f"SELECT {ACCOUNT_COLUMNS} FROM accounts WHERE phone = ?", (phone,))
+        return AccountRecord(*row) if row else None
+
+    async def get_session(self, phone):
+        """Строка сессии аккаунта или None"""
+        record = await self.get_account(phone)
+        return record.session_string if record else None
+
+    def _save_account_session(self, phone, session_string):
+        conn = self._connection()
+        with conn:
+            # UPSERT сохраняет id и created_at существующего аккаунта
+            conn.execute(
+                "INSERT INTO accounts (phone, session_string, status) VALUES (?, ?, 'active')"
+                " ON CONFLICT(phone) DO UPDATE SET session_string = excluded.session_string,"
+                " status = 'active', last_error = NULL, error_count = 0",
+                (phone, session_string)
+            )
+            return conn.execute(f"SELECT {ACCOUNT_COLUMNS} FROM accounts WHERE phone = ?", (phone,)).fetchone()
+
+    async def save_account_session(self, phone, session_string):
+        """Сохранить сессию аккаунта в базу"""
+        row = await self._run(self._save_account_session, phone, session_string)
+        self.index.put(AccountRecord(*row))
+
+    def _mark_used(self, phone, error):
+        conn = self._connection()
+        with conn:
+            if error is None:
+                conn.execute(
+                    "UPDATE accounts SET last_used_at = CURRENT_TIMESTAMP WHERE phone = ?", (phone,)
+                )
+            else:
+                conn.execute(
+                    "UPDATE accounts SET last_used_at = CURRENT_TIMESTAMP, last_error = ?,"
+                    " error_count = error_count + 1 WHERE phone = ?",
+                    (error, phone)
+                )
+            return conn.execute(f"SELECT {ACCOUNT_COLUMNS} FROM accounts WHERE phone = ?", (phone,)).fetchone()
+
+    async def mark_used(self, phone, error=None):
+        """Отметить использование аккаунта и, если была, его ошибку"""
+        row = await self._run(self._mark_used, phone, error)
+        if row is not None:
+            self.index.put(AccountRecord(*row))
+
+    def _record_health_checks(self, rows):
+        conn = self._connection()
+        with conn:
+            conn.executemany(
+                "UPDATE accounts SET status = COALESCE(?, status), last_error = ?,"
+                " last_checked_at = ? WHERE phone = ?",
+                rows
+            )
+
+    async def record_health_checks(self, results):
+        """Записать результаты проверки сессий одной транзакцией.
+
+        results: [(phone, новый статус или None, ошибка или None)]
+        """
+        # Тот же формат, что у CURRENT_TIMESTAMP (UTC)
+        checked_at = datetime.now(timezone.utc).strftime('%Y-%m-%d %H:%M:%S')
+        rows = [(status, error, checked_at, phone) for phone, status, error in results]
+        await self._run(self._record_health_checks, rows)
+        for phone, status, error in results:
+            fields = {'last_error': error, 'last_checked_at': checked_at}
+            if status is not None:
+                fields['status'] = status
+            self.index.update(phone, **fields)
+
+    async def get_history_cursors(self, phone):
+        """Курсоры истории чатов аккаунта: {chat_id: (last_message_id, code, span_start, span_end, score, text)}"""
+        rows = await self.fetchall(
+            "SELECT chat_id, last_message_id, code, span_start, span_end, score, text"
+            " FROM history_cursors WHERE phone = ?",
+            (phone,)
+        )
+        return {row[0]: row[1:] for row in rows}
+
+    def _save_history_cursors(self, phone, rows, keep):
+        conn = self._connection()
+        with conn:
+            conn.executemany(
+                "INSERT INTO history_cursors"
+                " (phone, chat_id, last_message_id, code, span_start, span_end, score, text)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?, ?)"
+                " ON CONFLICT(phone, chat_id) DO UPDATE SET last_message_id = excluded.last_message_id,"
+                " code = excluded.code, span_start = excluded.span_start, span_end = excluded.span_end,"
+                " score = excluded.score, text = excluded.text, updated_at = CURRENT_TIMESTAMP",
+                rows
+            )
+            if keep is not None:
+                # Чаты, выпавшие из верхних диалогов, больше не просматриваются
+                placeholders = ', '.join('?' * len(keep))
+                conn.execute(
+                    f"DELETE FROM history_cursors WHERE phone = ? AND chat_id NOT IN ({placeholders})",
+                    (phone, *keep)
+                )
+
+    async def save_history_cursors(self, phone, cursors, keep=None):
+        """Сохранить курсоры {chat_id: строка как у get_history_cursors} одной транзакцией.
+
+        keep - id чатов, курсоры которых остаются; курсоры остальных чатов удаляются.
+        """
+        if cursors or keep is not None:
+            rows = [(phone, chat_id, *row) for chat_id, row in cursors.items()]
+            await self._run(self._save_history_cursors, phone, rows, keep)
+
+    async def get_peers(self, phone):
+        """Сохраненные пиры аккаунта: [(id, access_hash, type, username, phone_number, updated_at)]"""
+        return await self.fetchall(
+            "SELECT peer_id, access_hash, type, username, phone_number, updated_at"
+            " FROM account_peers WHERE phone = ?",
+            (phone,)
+        )
+
+    def _save_peers(self, phone, peers, max_per_account, max_total):
+        conn = self._connection()
+        with conn:
+            conn.executemany(
+                "INSERT INTO account_peers (phone, peer_id, access_hash, type, username, phone_number, updated_at)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?)"
+                " ON CONFLICT(phone, peer_id) DO UPDATE SET access_hash = excluded.access_hash,"
+                " type = excluded.type, username = excluded.username,"
+                " phone_number = excluded.phone_number, updated_at = excluded.updated_at",
+                [(phone, *peer) for peer in peers]
+            )
+            # Лимиты: самые давно обновленные пиры аккаунта, затем всей таблицы
+            conn.execute(
+                "DELETE FROM account_peers WHERE phone = ? AND peer_id NOT IN"
+                " (SELECT peer_id FROM account_peers WHERE phone = ? ORDER BY updated_at DESC LIMIT ?)",
+                (phone, phone, max_per_account)
+            )
+            excess = conn.execute("SELECT COUNT(*) FROM account_peers").fetchone()[0] - max_total
+            if excess > 0:
+                conn.execute(
+                    "DELETE FROM account_peers WHERE (phone, peer_id) IN"
+                    " (SELECT phone, peer_id FROM account_peers ORDER BY updated_at LIMIT ?)",
+                    (excess,)
+                )
+
+    async def save_peers(self, phone, peers, max_per_account=1000, max_total=200000):
+        """Сохранить пиры [(id, access_hash, type, username, phone_number, last_update_on)]"""
+        await self._run(self._save_peers, phone, peers, max_per_account, max_total)
+
+    async def get_dialogs(self, phone, fresh_after):
+        """Кэш верхних диалогов аккаунта, сохраненный не раньше fresh_after (unix time)"""
+        return await self.fetchall(
+            "SELECT chat_id, type, title, first_name, last_name, username, is_verified, is_support, unread"
+            " FROM account_dialogs WHERE phone = ? AND cached_at >= ? ORDER BY position",
+            (phone, fresh_after)
+        )
+
+    def _save_dialogs(self, phone, rows):
+        conn = self._connection()
+        cached_at = time.time()
+        with conn:
+            conn.execute("DELETE FROM account_dialogs WHERE phone = ?", (phone,))
+            conn.executemany(
+                "INSERT INTO account_dialogs (phone, position, chat_id, type, title, first_name,"
+                " last_name, username, is_verified, is_support, unread, cached_at)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                [(phone, position, *row, cached_at) for position, row in enumerate(rows)]
+            )
+
+    async def save_dialogs(self, phone, rows):
+        """Заменить кэш верхних диалогов аккаунта"""
+        await self._run(self._save_dialogs, phone, rows)
+
+    async def get_all_accounts(self):
+        """Получить все активные аккаунты"""
+        if self.index.loaded:
+            self.index.hits += 1
+            return self.index.active_phones()
+
+        self.index.misses += 1
+        rows = await self.fetchall("SELECT phone FROM accounts WHERE status = 'active'")
+        return [row[0] for row in rows]
+
+    async def get_accounts_page(self, after_id=0, before_id=None, limit=10, prefix=''):
+        """Страница активных аккаунтов [(id, phone)] по ключу id.
+
+        Вперед - аккаунты с id > after_id, назад - с id < before_id.
+        Второе значение: есть ли еще аккаунты в направлении листания.
+        Страницы всегда читаются из базы и считаются промахами индекса.
+        """
+        self.index.misses += 1
+        where = "status = 'active'"
+        params = []
+        if prefix:
+            where += " AND phone LIKE ? ESCAPE '\\'"
+            escaped = prefix.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+            params.append(escaped + '%')
+
+        if before_id is not None:
+            sql = f"SELECT id, phone FROM accounts WHERE {where} AND id < ? ORDER BY id DESC LIMIT ?"
+        else:
+            sql = f"SELECT id, phone FROM accounts WHERE {where} AND id > ? ORDER BY id LIMIT ?"
+        params += [before_id if before_id is not None else after_id, limit + 1]
+
+        rows = await self.fetchall(sql, params)
+        has_more = len(rows) > limit
+        rows = rows[:limit]
+        if before_id is not None:
+            rows.reverse()
+        return rows, has_more
+
+    async def close(self):
+        """Закрыть соединение и остановить поток базы"""
+        if self._conn is not None:
+            await self._run(self._conn.close)
+            self._conn = None
+        self._executor.shutdown(wait=True)
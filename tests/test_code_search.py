@@ -0,0 +1,90 @@
+"""Порядок приоритета и курсоры в CodeSearch"""
+import asyncio
+
+from benchmarks.fake_telegram import SERVICE_CHAT_ID, FakeChat, FakeDialog, FakeMessage
+from code_extractor import CodeExtractor
+from code_search import CodeSearch, HistoryCursor
+
+BANK_CHAT_ID = 1001
+
+
+class SlowHistoryClient:
+    """Клиент, у которого история каждого чата грузится со своей задержкой"""
+
+    def __init__(self, histories, delays):
+        self.histories = histories  # {chat_id: [FakeMessage], от новых к старым}
+        self.delays = delays  # {chat_id: секунды}
+        self.loaded = []
+
+    async def get_chat_history(self, chat_id, limit=0):
+        await asyncio.sleep(self.delays.get(chat_id, 0))
+        self.loaded.append(chat_id)
+        for msg in self.histories[chat_id][:limit]:
+            yield msg
+
+
+def make_dialogs(texts):
+    """{chat_id: [text]} -> (histories, dialogs); служебный чат получает приоритет"""
+    histories = {}
+    dialogs = []
+    for chat_id, chat_texts in texts.items():
+        chat = FakeChat(chat_id, str(chat_id))
+        messages = [
+            FakeMessage(chat_id * 100 + len(chat_texts) - i, chat, text)
+            for i, text in enumerate(chat_texts)
+        ]
+        histories[chat_id] = messages
+        dialogs.append(FakeDialog(chat, messages, unread=0))
+    return histories, dialogs
+
+
+def test_priority_chat_wins_over_faster_lower_ranked():
+    histories, dialogs = make_dialogs({
+        BANK_CHAT_ID: ['Код: 42424'],
+        SERVICE_CHAT_ID: ['Login code: 99999'],
+    })
+    client = SlowHistoryClient(histories, {SERVICE_CHAT_ID: 0.05})
+    search = CodeSearch(CodeExtractor())
+
+    result = asyncio.run(search.search(client, dialogs=dialogs))
+
+    assert result.match.code == '99999'
+    assert result.chat.id == SERVICE_CHAT_ID
+
+
+def test_lower_ranked_loads_cancelled_after_priority_match():
+    histories, dialogs = make_dialogs({
+        BANK_CHAT_ID: ['Код: 42424'],
+        SERVICE_CHAT_ID: ['Login code: 99999'],
+    })
+    client = SlowHistoryClient(histories, {BANK_CHAT_ID: 1})
+    search = CodeSearch(CodeExtractor())
+
+    result = asyncio.run(search.search(client, dialogs=dialogs))
+
+    assert result.match.code == '99999'
+    assert client.loaded == [SERVICE_CHAT_ID]
+
+
+def test_cached_cursor_does_not_beat_fresh_priority_code():
+    histories, dialogs = make_dialogs({
+        BANK_CHAT_ID: ['Код: 42424'],
+        SERVICE_CHAT_ID: ['Login code: 99999', 'Login code: 11111'],
+    })
+    bank_top = histories[BANK_CHAT_ID][0]
+    old_service = histories[SERVICE_CHAT_ID][1]
+    extractor = CodeExtractor()
+    cursors = {
+        # В банке новых сообщений нет, в служебном чате пришел новый код
+        BANK_CHAT_ID: HistoryCursor(bank_top.id, extractor.find([bank_top.text])),
+        SERVICE_CHAT_ID: HistoryCursor(old_service.id, extractor.find([old_service.text])),
+    }
+    client = SlowHistoryClient(histories, {SERVICE_CHAT_ID: 0.05})
+    search = CodeSearch(extractor)
+
+    result = asyncio.run(search.search(client, cursors=cursors, dialogs=dialogs))
+
+    assert result.match.code == '99999'
+    assert client.loaded == [SERVICE_CHAT_ID]
+    assert result.cursors[SERVICE_CHAT_ID].last_message_id == histories[SERVICE_CHAT_ID][0].id
+    assert result.cursors[SERVICE_CHAT_ID].match.code == '99999'
@@ -0,0 +1,33 @@
+"""Загрузка и сохранение пиров в PeerCache"""
+import asyncio
+
+from benchmarks.fake_telegram import FakeStorage
+from peer_cache import PeerCache
+from storage import Storage
+
+
+class StorageClient:
+    def __init__(self):
+        self.storage = FakeStorage()
+
+
+def test_loaded_peers_keep_their_recency(tmp_path):
+    async def run():
+        storage = Storage(str(tmp_path / 'accounts.db'))
+        await storage.init_db()
+        try:
+            await storage.save_peers('+1', [
+                (1, 11, 'user', None, None, 100),
+                (2, 22, 'user', None, None, 200),
+            ])
+            cache = PeerCache(storage, max_per_account=2)
+            client = StorageClient()
+            await cache.load('+1', client)
+            # Новый пир, полученный после подключения
+            await client.storage.update_peers([(3, 33, 'user', None, None)])
+            await cache.save('+1', client)
+            return sorted(peer[0] for peer in await storage.get_peers('+1'))
+        finally:
+            await storage.close()
+
+    assert asyncio.run(run()) == [2, 3]
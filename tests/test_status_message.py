@@ -0,0 +1,32 @@
+"""Итог и промежуточные тексты StatusMessage"""
+import asyncio
+
+from pyrogram.errors import MessageIdInvalid
+
+from benchmarks.fake_telegram import FakeBotMessage
+from status_message import StatusMessage
+
+
+class BrokenEditMessage(FakeBotMessage):
+    """Сообщение бота, которое больше нельзя изменить"""
+
+    async def reply_text(self, text, **kwargs):
+        reply = BrokenEditMessage(self.from_user.id, text)
+        self.replies.append(reply)
+        return reply
+
+    async def edit_text(self, text, **kwargs):
+        raise MessageIdInvalid()
+
+
+def test_finish_replies_when_edit_fails():
+    async def run():
+        message = BrokenEditMessage(1, '/get_code')
+        status = StatusMessage(message, min_interval=0, show_after=0)
+        await status.start('Ищу код...')
+        status.update('Просмотрено 1 из 2')
+        await asyncio.sleep(0)  # правка промежуточного текста падает в фоне
+        await status.finish('Код: 12345')
+        return [reply.text for reply in message.replies]
+
+    assert asyncio.run(run()) == ['Ищу код...', 'Код: 12345']
@@ -0,0 +1,24 @@
+"""Курсоры истории в Storage"""
+import asyncio
+
+from storage import Storage
+
+
+def test_history_cursors_pruned_to_top_dialogs(tmp_path):
+    async def run():
+        storage = Storage(str(tmp_path / 'accounts.db'))
+        await storage.init_db()
+        try:
+            row = (10, '12345', 0, 5, 1.0, '12345')
+            await storage.save_history_cursors('+1', {1: row, 2: row, 3: row})
+            await storage.save_history_cursors('+2', {1: row})
+            # Чат 2 выпал из верхних диалогов, в чате 3 новых сообщений нет
+            await storage.save_history_cursors('+1', {1: row}, keep=(1, 3))
+            return await storage.get_history_cursors('+1'), await storage.get_history_cursors('+2')
+        finally:
+            await storage.close()
+
+    first, second = asyncio.run(run())
+
+    assert sorted(first) == [1, 3]
+    assert sorted(second) == [1]
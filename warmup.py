@@ -0,0 +1,70 @@
+import asyncio
+import time
+from contextlib import suppress
+
+
+class PoolWarmer:
+    """Прогрев пула при запуске: заранее подключает "горячие" аккаунты.
+
+    Подключения идут в фоне, не больше ``concurrency`` одновременно, так
+    что бот принимает команды сразу. Команда для аккаунта, который еще
+    подключается, ждет это же подключение в пуле.
+    """
+
+    def __init__(self, pool, concurrency=5, report_every=5):
+        self._pool = pool
+        self._task = None
+        self.concurrency = concurrency
+        self.report_every = report_every  # печатать прогресс каждые N аккаунтов
+        self.total = 0
+        self.warmed = 0
+        self.failed = 0
+        self.started_at = None
+        self.duration = None  # секунды до готовности, None пока идет прогрев
+
+    @property
+    def done(self):
+        return self.warmed + self.failed
+
+    async def start(self, phones):
+        """Запустить прогрев в текущем цикле событий"""
+        self.total = len(phones)
+        self.started_at = time.monotonic()
+        if not phones:
+            self._finish()
+            return
+        self._task = asyncio.get_running_loop().create_task(self._warm_all(phones))
+
+    async def _warm_all(self, phones):
+        semaphore = asyncio.Semaphore(self.concurrency)
+
+        async def warm(phone):
+            async with semaphore:
+                try:
+                    ok = await self._pool.warm(phone)
+                except Exception as e:
+                    ok = False
+                    print(f"⚠️ Прогрев {phone}: {e!r}")
+            if ok:
+                self.warmed += 1
+            else:
+                self.failed += 1
+            if self.done % self.report_every == 0 and self.done < self.total:
+                print(f"🔥 Прогрев: {self.done}/{self.total}")
+
+        await asyncio.gather(*(warm(phone) for phone in phones))
+        self._finish()
+
+    def _finish(self):
+        self.duration = time.monotonic() - self.started_at
+        print(
+            f"✅ Прогрев завершен за {self.duration:.1f}с: "
+            f"подключено {self.warmed}, ошибок {self.failed}"
+        )
+
+    async def close(self):
+        if self._task is not None:
+            self._task.cancel()
+            with suppress(asyncio.CancelledError):
+                await self._task
+            self._task = None
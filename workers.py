@@ -0,0 +1,350 @@
+"""Процессы-воркеры аккаунтов.
+
+Аккаунты распределяются между воркерами по хэшу телефона; каждый воркер
+держит свой пул клиентов, очередь вызовов и поиск кодов. Бот передает
+задания владельцу аккаунта через Unix-сокет (JSON, по строке на
+сообщение) и ждет ответ. Внешний брокер не нужен.
+
+Воркер запускается ботом: python workers.py <сокет> <конфигурация JSON>
+"""
+import asyncio
+import importlib
+import itertools
+import json
+import os
+import signal
+import sys
+import tempfile
+import zlib
+from contextlib import suppress
+
+from pyrogram.errors import FloodWait
+
+from jobs import CodeOutcome
+
+# Длина одной строки протокола (текст сообщения с кодом помещается с запасом)
+LINE_LIMIT = 1024 * 1024
+
+
+def shard_for(phone, count):
+    """Номер воркера, владеющего аккаунтом (одинаков во всех процессах)"""
+    return zlib.crc32(phone.encode()) % count
+
+
+class WorkerError(Exception):
+    """Воркер недоступен или задание завершилось ошибкой"""
+
+
+class _Worker:
+    """Один процесс-воркер и соединение с ним"""
+
+    def __init__(self, index, socket_path, config):
+        self.index = index
+        self.socket_path = socket_path
+        self._config = config
+        self._process = None
+        self._reader = None
+        self._writer = None
+        self._reader_task = None
+        self._pending = {}  # {id: Future}
+        self._ids = itertools.count(1)
+        self._lock = asyncio.Lock()
+        self.restarts = 0
+
+    @property
+    def alive(self):
+        return self._writer is not None and self._process.returncode is None
+
+    @property
+    def pending(self):
+        return len(self._pending)
+
+    async def start(self, timeout=30):
+        with suppress(FileNotFoundError):
+            os.unlink(self.socket_path)
+        self._process = await asyncio.create_subprocess_exec(
+            sys.executable, os.path.abspath(__file__), self.socket_path, json.dumps(self._config)
+        )
+
+        # Ждем, пока воркер откроет сокет
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + timeout
+        while True:
+            try:
+                self._reader, self._writer = await asyncio.open_unix_connection(
+                    self.socket_path, limit=LINE_LIMIT
+                )
+                break
+            except (FileNotFoundError, ConnectionRefusedError):
+                if self._process.returncode is not None:
+                    raise WorkerError(f"воркер {self.index} завершился при запуске")
+                if loop.time() > deadline:
+                    self._process.kill()
+                    raise WorkerError(f"воркер {self.index} не запустился за {timeout}с")
+                await asyncio.sleep(0.05)
+        self._reader_task = loop.create_task(self._read_loop())
+
+    async def call(self, op, **args):
+        if not self.alive:
+            async with self._lock:
+                if not self.alive:
+                    await self._restart()
+
+        request_id = next(self._ids)
+        future = asyncio.get_running_loop().create_future()
+        self._pending[request_id] = future
+        try:
+            self._writer.write(json.dumps({'id': request_id, 'op': op, 'args': args}).encode() + b'\n')
+            await self._writer.drain()
+            response = await future
+        finally:
+            self._pending.pop(request_id, None)
+
+        error = response.get('error')
+        if error is None:
+            return response['result']
+        if error['type'] == 'FloodWait':
+            raise FloodWait(value=error['value'])
+        raise WorkerError(f"{error['type']}: {error['message']}")
+
+    async def _restart(self):
+        await self._stop()
+        self.restarts += 1
+        await self.start()
+
+    async def _read_loop(self):
+        try:
+            while line := await self._reader.readline():
+                response = json.loads(line)
+                future = self._pending.get(response['id'])
+                if future is not None and not future.done():
+                    future.set_result(response)
+        finally:
+            # Соединение потеряно: незавершенные задания получают ошибку,
+            # следующее задание перезапустит воркер
+            self._writer = None
+            for future in self._pending.values():
+                if not future.done():
+                    future.set_exception(WorkerError(f"воркер {self.index} завершился"))
+
+    async def _stop(self, timeout=10):
+        writer, self._writer = self._writer, None
+        if writer is not None:
+            # Закрытие соединения - сигнал воркеру завершиться
+            writer.close()
+        if self._process is not None and self._process.returncode is None:
+            try:
+                await asyncio.wait_for(self._process.wait(), timeout)
+            except asyncio.TimeoutError:
+                self._process.kill()
+                await self._process.wait()
+        if self._reader_task is not None:
+            self._reader_task.cancel()
+            with suppress(asyncio.CancelledError):
+                await self._reader_task
+            self._reader_task = None
+
+
+class WorkerPool:
+    """Операции с аккаунтами в ``count`` процессах-воркерах.
+
+    Интерфейс тот же, что у jobs.LocalJobs. ``config`` передается
+    каждому воркеру (см. build_jobs).
+    """
+
+    def __init__(self, count, config):
+        self._dir = tempfile.mkdtemp(prefix='bot-workers-')
+        self._workers = [
+            _Worker(i, os.path.join(self._dir, f'worker-{i}.sock'), config) for i in range(count)
+        ]
+
+    def __len__(self):
+        return len(self._workers)
+
+    async def start(self):
+        await asyncio.gather(*(worker.start() for worker in self._workers))
+
+    def _owner(self, phone):
+        return self._workers[shard_for(phone, len(self._workers))]
+
+    async def get_code(self, phone, on_progress=None):
+        # Ход поиска из воркера не передается - только итог
+        result = await self._owner(phone).call('get_code', phone=phone)
+        return CodeOutcome(*result) if result is not None else None
+
+    async def create_channel(self, phone, title, description=None):
+        return await self._owner(phone).call(
+            'create_channel', phone=phone, title=title, description=description
+        )
+
+    async def warm(self, phone):
+        return await self._owner(phone).call('warm', phone=phone)
+
+    async def check_session(self, phone, timeout=30):
+        status, error = await self._owner(phone).call('check_session', phone=phone, timeout=timeout)
+        return status, error
+
+    async def evict(self, phone):
+        await self._owner(phone).call('evict', phone=phone)
+
+    async def worker_stats(self):
+        """Сумма счетчиков работающих воркеров (клиенты в пулах, очередь, FloodWait)"""
+        alive = [worker for worker in self._workers if worker.alive]
+        results = await asyncio.gather(*(worker.call('stats') for worker in alive), return_exceptions=True)
+        totals = {}
+        for result in results:
+            if isinstance(result, dict):
+                for key, value in result.items():
+                    totals[key] = totals.get(key, 0) + value
+        return totals
+
+    async def close(self):
+        await asyncio.gather(*(worker._stop() for worker in self._workers))
+        with suppress(OSError):
+            for name in os.listdir(self._dir):
+                os.unlink(os.path.join(self._dir, name))
+            os.rmdir(self._dir)
+
+    def stats(self):
+        return {
+            'workers': len(self._workers),
+            'alive': sum(1 for w in self._workers if w.alive),
+            'pending': sum(w.pending for w in self._workers),
+            'restarts': sum(w.restarts for w in self._workers),
+        }
+
+
+# --- Процесс воркера ---
+
+def build_jobs(config):
+    """Собрать пул клиентов, очередь вызовов и поиск кодов воркера"""
+    import metrics
+    from account_pool import AccountPool
+    from code_extractor import CodeExtractor
+    from code_search import CodeSearch
+    from jobs import LocalJobs
+    from peer_cache import PeerCache
+    from scheduler import AccountScheduler
+    from storage import Storage
+
+    module_name, _, class_name = config.get('client', 'pyrogram:Client').partition(':')
+    client_class = getattr(importlib.import_module(module_name), class_name)
+    if config.get('client_options'):
+        # Настройки класса клиента (задержки имитации в нагрузочном тесте)
+        client_class.configure(**config['client_options'])
+
+    # Индекс не загружаем: аккаунты, добавленные ботом позже, читаются из базы
+    storage = Storage(config['db_path'])
+    scheduler = AccountScheduler(
+        rate=config['account_rate'],
+        burst=config['account_burst'],
+        max_concurrency=config['account_max_concurrency'],
+        max_flood_wait=config['max_flood_wait']
+    )
+
+    async def get_account_client(phone):
+        session_string = await storage.get_session(phone)
+        if not session_string:
+            return None
+        client = metrics.instrument_client(client_class(
+            f"account_{phone}",
+            api_id=config['api_id'],
+            api_hash=config['api_hash'],
+            session_string=session_string,
+            sleep_threshold=0
+        ))
+        return scheduler.wrap(client, phone)
+
+    peer_cache = PeerCache(
+        storage,
+        max_per_account=config['peer_cache_per_account'],
+        max_total=config['peer_cache_total'],
+        dialogs_ttl=config['dialog_cache_ttl']
+    )
+    pool = AccountPool(
+        get_account_client,
+        max_size=config['pool_size'],
+        idle_ttl=config['pool_idle_ttl'],
+        on_connect=peer_cache.load,
+        on_disconnect=peer_cache.save
+    )
+    search = CodeSearch(
+        CodeExtractor(),
+        dialogs_limit=config['search_dialogs'],
+        concurrency=config['search_concurrency']
+    )
+    jobs = LocalJobs(pool, search, storage, peer_cache, factory=get_account_client)
+    return jobs, pool, storage, scheduler
+
+
+async def _run_job(jobs, request, stats):
+    op, args = request['op'], request['args']
+    try:
+        if op == 'get_code':
+            result = await jobs.get_code(**args)
+        elif op == 'create_channel':
+            result = await jobs.create_channel(**args)
+        elif op == 'warm':
+            result = await jobs.warm(**args)
+        elif op == 'check_session':
+            result = await jobs.check_session(**args)
+        elif op == 'evict':
+            result = await jobs.evict(**args)
+        elif op == 'stats':
+            result = stats()
+        else:
+            raise ValueError(f"неизвестная операция {op}")
+        return {'id': request['id'], 'result': result}
+    except Exception as e:
+        return {'id': request['id'], 'error': {
+            'type': type(e).__name__,
+            'message': str(e),
+            'value': getattr(e, 'value', None),
+        }}
+
+
+async def serve(socket_path, config):
+    """Обслуживать задания бота, пока открыто соединение с ним"""
+    jobs, pool, storage, scheduler = build_jobs(config)
+
+    def stats():
+        counters = scheduler.stats()
+        counters['clients'] = len(pool)
+        return counters
+    finished = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    loop.add_signal_handler(signal.SIGTERM, finished.set)
+    loop.add_signal_handler(signal.SIGINT, finished.set)  # Ctrl+C получает вся группа процессов
+
+    async def handle(reader, writer):
+        tasks = set()
+
+        async def respond(request):
+            response = await _run_job(jobs, request, stats)
+            writer.write(json.dumps(response).encode() + b'\n')
+            await writer.drain()
+
+        try:
+            while line := await reader.readline():
+                task = loop.create_task(respond(json.loads(line)))
+                tasks.add(task)
+                task.add_done_callback(tasks.discard)
+        finally:
+            for task in tasks:
+                task.cancel()
+            finished.set()
+
+    server = await asyncio.start_unix_server(handle, socket_path, limit=LINE_LIMIT)
+    await finished.wait()
+    server.close()
+    await pool.close()
+    await storage.close()
+
+
+def main(argv):
+    socket_path, config = argv[0], json.loads(argv[1])
+    asyncio.run(serve(socket_path, config))
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])